@@ -1,463 +1,75 @@
-from flask import Flask, config, render_template, request, redirect, url_for, flash, jsonify, send_file, send_from_directory, session
-from functools import wraps
-import json, os
-import qrcode
-from io import BytesIO
-import base64
-from utils.storage import guardar_registro, usuario_existe
-from utils.validators import validar_input
+from flask import Flask
+from werkzeug.middleware.proxy_fix import ProxyFix
+import os
+import logging
+from utils.storage import migrar_todos, configurar_backend, configurar_carpeta
+from utils import diferida, sesiones, formularios
+from utils.metricas import instrumentar
+from utils.assets import init_assets
 from config import DevelopmentConfig, ProductionConfig
+from rutas.admin import admin
+from rutas.publico import publico
+from rutas.qr import qr
+from rutas.cambios import cambios
 
-# Detectar entorno
-env = os.getenv("FLASK_ENV", "development")
 
-app = Flask(__name__)
+def create_app(config=None):
+    """Crear la aplicación: configuración, instrumentación, almacenamiento y blueprints.
 
-# Cargar la configuración correspondiente
-if env == "production":
-    app.config.from_object(ProductionConfig)
-else:
-    app.config.from_object(DevelopmentConfig)
+    Las carpetas de datos y formularios se crean al escribir en ellas, no al
+    arrancar. Los módulos de QR (qrcode, Pillow) se cargan con la primera
+    vista que los usa.
+    """
+    app = Flask(__name__)
 
-# Crear carpetas si no existen
-os.makedirs(app.config["DATA_DIR"], exist_ok=True)
-os.makedirs(app.config["FORMS_DIR"], exist_ok=True)
+    # Cargar la configuración correspondiente al entorno
+    if config is None:
+        config = ProductionConfig if os.getenv("FLASK_ENV", "development") == "production" else DevelopmentConfig
+    app.config.from_object(config)
 
-FORMS_DIR = app.config["FORMS_DIR"]
-DATA_DIR = app.config["DATA_DIR"]
+    # IP del cliente detrás del proxy de la plataforma (para los límites de envío)
+    if app.config["PROXIES_CONFIABLES"]:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["PROXIES_CONFIABLES"])
 
-# Variables útiles
-ADMIN_USER = app.config["ADMIN_USER"]
-ADMIN_PASS = app.config["ADMIN_PASS"]
+    # Logs estructurados e instrumentación (latencias por ruta, spans y templates)
+    logging.basicConfig(level=app.config["LOG_LEVEL"], format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    instrumentar(app)
 
-def login_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if not session.get("logged_in"):
-            flash("Debes iniciar sesión para acceder al panel.", "error")
-            return redirect(url_for("login"))
-        return f(*args, **kwargs)
-    return decorated_function
+    # Sesiones de administrador guardadas en el servidor (la cookie solo lleva un identificador)
+    if app.config["SESIONES"] == "sqlite":
+        app.session_interface = sesiones.SesionesSQLite()
+    elif app.config["SESIONES"] != "cookie":
+        raise ValueError(f"Almacén de sesiones desconocido: {app.config['SESIONES']}")
 
-@app.route("/login", methods=["GET", "POST"])
-def login():
-    if request.method == "POST":
-        usuario = request.form["usuario"]
-        password = request.form["password"]
+    # CSS purgado y precomprimido con hash en el nombre: asset_url() en los templates
+    init_assets(app)
 
-        if usuario == ADMIN_USER and password == ADMIN_PASS:
-            session["logged_in"] = True
-            flash("Bienvenido al panel administrativo.", "success")
-            return redirect(url_for("index"))
-        else:
-            flash("Usuario o contraseña incorrectos.", "error")
+    # Carpeta de definiciones de formularios (la misma para la caché y el editor)
+    formularios.configurar_carpeta(app.config["FORMS_DIR"])
 
-    return render_template("login.html")
+    # Backend de almacenamiento (archivos JSONL+CSV o SQLite) y migración única
+    # de los registros heredados
+    configurar_carpeta(app.config["DATA_DIR"])
+    configurar_backend(app.config["STORAGE_BACKEND"], archivar_mb=app.config["ARCHIVAR_MB"])
+    migrar_todos()
 
+    # Escritura diferida: reaplicar lo que quedó en diarios de procesos caídos
+    if app.config["ESCRITURA_DIFERIDA"]:
+        diferida.iniciar()
 
-@app.route("/logout")
-def logout():
-    session.pop("logged_in", None)
-    flash("Sesión cerrada correctamente.", "info")
-    return redirect(url_for("login"))
+    app.register_blueprint(publico)
+    app.register_blueprint(admin)
+    app.register_blueprint(qr)
+    app.register_blueprint(cambios)
+    return app
 
-@app.route("/admin")
-@login_required
-def admin_dashboard():
-    return render_template("admin_dashboard.html")
 
+# gunicorn app:app y @vercel/python importan esta instancia
+app = create_app()
 
-@app.route("/admin/registros")
-@login_required
-def admin_registros():
-    archivos = []
-    data_dir = "data"
-    if os.path.exists(data_dir):
-        for archivo in os.listdir(data_dir):
-            if archivo.endswith(".csv"):
-                tamaño = os.path.getsize(os.path.join(data_dir, archivo)) / 1024
-                archivos.append({
-                    "nombre": archivo,
-                    "tamaño": f"{tamaño:.2f} KB"
-                })
-    return render_template("registros.html", archivos=archivos)
-
-
-# -----------------------
-# Página principal: listar formularios activos
-# -----------------------
-@app.route("/")
-@login_required
-def index():
-    formularios = []
-    if os.path.exists(FORMS_DIR):
-        for archivo in os.listdir(FORMS_DIR):
-            if archivo.endswith(".json"):
-                ruta = os.path.join(FORMS_DIR, archivo)
-                with open(ruta, "r", encoding="utf-8") as f:
-                    try:
-                        config = json.load(f)
-                        if not config.get("activo", True):
-                            continue  # No mostrar formularios desactivados
-                        nombre = os.path.splitext(archivo)[0]
-                        formularios.append({
-                            "nombre": nombre,
-                            "titulo": config.get("titulo", nombre),
-                            "descripcion": config.get("descripcion", "")
-                        })
-                    except json.JSONDecodeError:
-                        pass
-
-    return render_template("index.html", formularios=formularios)
-
-@app.route("/formulario/<nombre>", methods=["GET", "POST"])
-def formulario(nombre):
-    session.pop('_flashes', None)  # Limpia cualquier mensaje previo
-    ruta = os.path.join(FORMS_DIR, f"{nombre}.json")
-    if not os.path.exists(ruta):
-        return f"No se encontró el formulario '{nombre}'.", 404
-
-    with open(ruta, "r", encoding="utf-8") as f:
-        config = json.load(f)
-
-    if not config.get("activo", True):
-        #return "Este formulario no está disponible en este momento.", 403
-        return render_template("components/form_inactivo.html", titulo=config.get("titulo", nombre))
-     
-
-    datos = {}  # Para mantener los valores ingresados
-    errores_por_campo = {}  # Nuevo: diccionario para errores por campo
-
-    if request.method == "POST":
-        errores_generales = []  # Para errores que no son de un campo específico
-        
-        for campo in config["campos"]:
-            nombre_campo = campo["nombre"]
-
-            # Checkbox puede ser multiple, otros campos simples
-            if campo["tipo"] == "checkbox":
-                valor = request.form.getlist(nombre_campo)
-            else:
-                valor = request.form.get(nombre_campo, "").strip()
-
-            datos[nombre_campo] = valor
-
-            # Validaciones por campo
-            mensaje_error = None
-            
-            if campo.get("obligatorio") and (not valor or valor == [""]):
-                mensaje_error = f"Este campo es obligatorio"
-            elif not validar_input(valor, campo):
-                mensaje_error = f"El valor no cumple con el formato requerido"
-            
-            if mensaje_error:
-                errores_por_campo[nombre_campo] = mensaje_error
-
-        # Validación de duplicados (error general)
-        identificador = config.get("identificador_unico")
-        if identificador and usuario_existe(nombre, identificador, datos.get(identificador)):
-            errores_generales.append(f"Ya existe un registro con {identificador}: {datos.get(identificador)}")
-
-        if errores_por_campo or errores_generales:
-            # Pasar errores específicos a la template
-            for error in errores_generales:
-                flash(error, "error")
-            return render_template("form.html", config=config, datos=datos, errores=errores_por_campo)
-
-        # Guardar registro
-        guardar_registro(nombre, datos)
-        return render_template("components/success.html", titulo=config["titulo"], form_name=nombre)
-
-    # GET request
-    return render_template("form.html", config=config, datos={}, errores={})
-
-# -----------------------
-# Formulario dinámico
-# -----------------------
-@app.route("/admin/formularios")
-@login_required
-def admin_formularios():
-    """Lista todos los formularios para administración"""
-    formularios = []
-
-    if os.path.exists(FORMS_DIR):
-        for archivo in os.listdir(FORMS_DIR):
-            if archivo.endswith(".json"):
-                ruta = os.path.join(FORMS_DIR, archivo)
-                with open(ruta, "r", encoding="utf-8") as f:
-                    try:
-                        config = json.load(f)
-                        nombre = os.path.splitext(archivo)[0]
-                        
-                        # Obtener el número de campos
-                        campos_count = len(config.get("campos", []))
-                        
-                        formularios.append({
-                            "nombre": nombre,
-                            "archivo": archivo,
-                            "titulo": config.get("titulo", nombre),
-                            "descripcion": config.get("descripcion", ""),
-                            "activo": config.get("activo", True),
-                            "campos": campos_count  # <- Agregar esta línea
-                        })
-                    except json.JSONDecodeError:
-                        pass
-
-    return render_template("admin_formularios.html", formularios=formularios)
-
-@app.route("/admin/formulario/<nombre>", methods=["GET", "POST"])
-@login_required
-def editar_formulario(nombre):
-    """Editar un formulario específico"""
-    ruta = os.path.join(FORMS_DIR, f"{nombre}.json")
-    
-    if not os.path.exists(ruta):
-        return jsonify({"success": False, "error": f"No se encontró el formulario '{nombre}'."}), 404
-
-    try:
-        if request.method == "POST":
-            # Obtener los datos del formulario de edición
-            config_data = request.get_json()
-            
-            # Validar estructura básica
-            if not config_data or "titulo" not in config_data:
-                return jsonify({"success": False, "error": "Estructura inválida"}), 400
-            
-            # Guardar el archivo
-            with open(ruta, "w", encoding="utf-8") as f:
-                json.dump(config_data, f, ensure_ascii=False, indent=2)
-            
-            return jsonify({"success": True, "message": "Formulario actualizado correctamente"})
-
-        # GET request - cargar el formulario existente
-        with open(ruta, "r", encoding="utf-8") as f:
-            config = json.load(f)
-        
-        return jsonify(config)
-        
-    except json.JSONDecodeError as e:
-        return jsonify({"success": False, "error": f"Error en el formato JSON del archivo: {str(e)}"}), 500
-    except Exception as e:
-        return jsonify({"success": False, "error": f"Error interno del servidor: {str(e)}"}), 500
-
-@app.route("/admin/formulario/nuevo", methods=["POST"])
-@login_required
-def nuevo_formulario():
-    """Crear un nuevo formulario"""
-    try:
-        print("=== SOLICITUD NUEVO FORMULARIO RECIBIDA ===")  # Debug
-        print("Headers:", request.headers)  # Debug
-        print("Content-Type:", request.content_type)  # Debug
-        
-        data = request.get_json()
-        print("Datos recibidos:", data)  # Debug
-        
-        if not data:
-            print("❌ No se recibieron datos JSON")  # Debug
-            return jsonify({"success": False, "error": "No se recibieron datos"}), 400
-            
-        nombre = data.get("nombre")
-        titulo = data.get("titulo", nombre)
-        
-        print(f"Nombre: {nombre}, Título: {titulo}")  # Debug
-        
-        if not nombre:
-            print("❌ Nombre vacío")  # Debug
-            return jsonify({"success": False, "error": "El nombre es requerido"}), 400
-        
-        # Validar que el nombre sea válido para archivo
-        nombre_archivo = "".join(c for c in nombre if c.isalnum() or c in (' ', '-', '_')).strip()
-        nombre_archivo = nombre_archivo.replace(' ', '_').lower()
-        
-        print(f"Nombre archivo: {nombre_archivo}")  # Debug
-        
-        ruta = os.path.join(FORMS_DIR, f"{nombre_archivo}.json")
-        print(f"Ruta destino: {ruta}")  # Debug
-        
-        # Verificar si el directorio existe
-        if not os.path.exists(FORMS_DIR):
-            print("❌ Directorio forms no existe")  # Debug
-            os.makedirs(FORMS_DIR)
-            print("✅ Directorio forms creado")  # Debug
-        
-        if os.path.exists(ruta):
-            print("❌ Archivo ya existe")  # Debug
-            return jsonify({"success": False, "error": "Ya existe un formulario con ese nombre"}), 400
-        
-        # Estructura básica del formulario
-        nuevo_formulario = {
-            "titulo": titulo,
-            "activo": True,
-            "descripcion": "",
-            "campos": []
-        }
-        
-        print("Guardando archivo...")  # Debug
-        with open(ruta, "w", encoding="utf-8") as f:
-            json.dump(nuevo_formulario, f, ensure_ascii=False, indent=2)
-        
-        print("✅ Archivo guardado exitosamente")  # Debug
-        return jsonify({
-            "success": True, 
-            "message": "Formulario creado correctamente", 
-            "nombre": nombre_archivo
-        })
-        
-    except Exception as e:
-        print(f"❌ Error exception: {str(e)}")  # Debug
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")  # Debug
-        return jsonify({"success": False, "error": str(e)}), 500
-
-@app.route("/admin/formulario/<nombre>/eliminar", methods=["POST"])
-@login_required
-def eliminar_formulario(nombre):
-    """Eliminar un formulario"""
-    try:
-        ruta = os.path.join(FORMS_DIR, f"{nombre}.json")
-        
-        if os.path.exists(ruta):
-            os.remove(ruta)
-            return jsonify({"success": True, "message": "Formulario eliminado correctamente"})
-        else:
-            return jsonify({"success": False, "error": "Formulario no encontrado"})
-            
-    except Exception as e:
-        return jsonify({"success": False, "error": str(e)})
-    
-def verificar_archivo_formulario(ruta):
-    """Verifica que el archivo de formulario exista y sea JSON válido"""
-    if not os.path.exists(ruta):
-        return False, "El archivo no existe"
-    
-    try:
-        with open(ruta, "r", encoding="utf-8") as f:
-            json.load(f)
-        return True, "OK"
-    except json.JSONDecodeError as e:
-        return False, f"JSON inválido: {str(e)}"
-    except Exception as e:
-        return False, f"Error al leer archivo: {str(e)}"
-    
-@app.route("/admin/qr-generator")
-@login_required
-def qr_generator():
-    """Página para generar códigos QR de formularios"""
-    formularios = []
-    
-    if os.path.exists(FORMS_DIR):
-        for archivo in os.listdir(FORMS_DIR):
-            if archivo.endswith(".json"):
-                ruta = os.path.join(FORMS_DIR, archivo)
-                with open(ruta, "r", encoding="utf-8") as f:
-                    try:
-                        config = json.load(f)
-                        nombre = os.path.splitext(archivo)[0]
-                        formularios.append({
-                            "nombre": nombre,
-                            "titulo": config.get("titulo", nombre),
-                            "descripcion": config.get("descripcion", ""),
-                            "activo": config.get("activo", True)
-                        })
-                    except json.JSONDecodeError:
-                        pass
-    
-    return render_template("qr_generator.html", formularios=formularios)
-
-@app.route("/admin/generar-qr/<nombre_formulario>")
-@login_required
-def generar_qr(nombre_formulario):
-    """Genera y devuelve un código QR para un formulario específico"""
-    try:
-        # Construir la URL del formulario
-        base_url = request.host_url.rstrip('/')
-        formulario_url = f"{base_url}/formulario/{nombre_formulario}"
-        
-        # Crear el código QR
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(formulario_url)
-        qr.make(fit=True)
-        
-        # Crear imagen del QR
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Convertir a bytes
-        img_buffer = BytesIO()
-        img.save(img_buffer, format='PNG')
-        img_buffer.seek(0)
-        
-        return send_file(img_buffer, mimetype='image/png', download_name=f'qr_{nombre_formulario}.png')
-        
-    except Exception as e:
-        return f"Error al generar QR: {str(e)}", 500
-
-@app.route("/admin/generar-qr-base64/<nombre_formulario>")
-@login_required
-def generar_qr_base64(nombre_formulario):
-    """Genera un código QR en base64 para mostrar directamente en HTML"""
-    try:
-        # Construir la URL del formulario
-        base_url = request.host_url.rstrip('/')
-        formulario_url = f"{base_url}/formulario/{nombre_formulario}"
-        
-        # Crear el código QR
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=8,
-            border=2,
-        )
-        qr.add_data(formulario_url)
-        qr.make(fit=True)
-        
-        # Crear imagen del QR
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Convertir a base64
-        img_buffer = BytesIO()
-        img.save(img_buffer, format='PNG')
-        img_data = base64.b64encode(img_buffer.getvalue()).decode()
-        
-        return jsonify({
-            "success": True,
-            "qr_image": f"data:image/png;base64,{img_data}",
-            "formulario_url": formulario_url,
-            "nombre_formulario": nombre_formulario
-        })
-        
-    except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
-
-
-@app.route("/descargar/<nombre>")
-@login_required
-def descargar(nombre):
-    return send_from_directory(DATA_DIR, nombre, as_attachment=True)
-
-@app.route("/eliminar/<nombre>")
-@login_required
-def eliminar(nombre):
-    ruta = os.path.join(DATA_DIR, nombre)
-    if os.path.exists(ruta):
-        os.remove(ruta)
-        json_ruta = os.path.join(DATA_DIR, f"{os.path.splitext(nombre)[0]}.json")
-        if os.path.exists(json_ruta):
-            os.remove(json_ruta)
-            #flash(f"El archivo JSON asociado a '{nombre}' ha sido eliminado.", "success")
-        return render_template("components/eliminar.html", nombre=nombre)
-    else:
-        flash(f"El archivo '{nombre}' no se encontró.", "error")
-    return redirect(url_for("admin_registros"))
-
-    
 
 # -----------------------
 # Ejecutar servidor
 # -----------------------
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
@@ -0,0 +1,121 @@
+"""Benchmark de arranque en frío.
+
+Lanza varios procesos nuevos de Python (como un worker recién creado en
+Render o una función de Vercel) y mide en cada uno:
+  - importación de `app` (crea la aplicación y registra los blueprints);
+  - tiempo hasta la primera respuesta de GET /formulario/<nombre> (lo que
+    espera quien escanea un QR) y de la primera generación de QR;
+  - si qrcode/Pillow quedaron cargados antes de usarlos.
+
+El resultado se escribe en JSON (--salida) para comparar corridas.
+
+Uso:
+    python benchmarks/arranque.py --procesos 10 --salida arranque.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FORM = "bench"
+CONFIG_FORM = {
+    "titulo": "Benchmark",
+    "activo": True,
+    "descripcion": "",
+    "campos": [{"nombre": "Nombre", "tipo": "text", "obligatorio": True}],
+}
+
+# Se ejecuta en cada proceso hijo; imprime una línea JSON con las mediciones
+HIJO = f"""
+import json, sys, time
+inicio = time.perf_counter()
+from app import app
+importado = time.perf_counter()
+qr_al_arrancar = "qrcode" in sys.modules or "PIL" in sys.modules
+cliente = app.test_client()
+respuesta = cliente.get("/formulario/{FORM}")
+primera = time.perf_counter()
+assert respuesta.status_code == 200, respuesta.status_code
+with cliente.session_transaction() as sesion:
+    sesion["logged_in"] = True
+inicio_qr = time.perf_counter()
+assert cliente.get("/admin/generar-qr/{FORM}").status_code == 200
+fin_qr = time.perf_counter()
+print(json.dumps({{
+    "importacion_app": importado - inicio,
+    "primera_respuesta": primera - inicio,
+    "primer_qr": fin_qr - inicio_qr,
+    "qr_al_arrancar": qr_al_arrancar,
+}}))
+"""
+
+
+def resumen(muestras):
+    """Mediana, mínimo y máximo en milisegundos"""
+    return {
+        "mediana_ms": round(statistics.median(muestras) * 1000, 2),
+        "min_ms": round(min(muestras) * 1000, 2),
+        "max_ms": round(max(muestras) * 1000, 2),
+    }
+
+
+def medir_proceso(tmp):
+    entorno = {**os.environ, "PYTHONPATH": RAIZ, "FLASK_ENV": "production", "LOG_LEVEL": "WARNING",
+               "PYTHONDONTWRITEBYTECODE": "1"}
+    salida = subprocess.run([sys.executable, "-c", HIJO], cwd=tmp, env=entorno,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(salida.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--procesos", type=int, default=10, help="arranques medidos")
+    parser.add_argument("--salida", default="arranque.json")
+    args = parser.parse_args()
+
+    salida = os.path.abspath(args.salida)
+    tmp = tempfile.mkdtemp(prefix="form_web_arranque_")
+    os.makedirs(os.path.join(tmp, "forms"))
+    with open(os.path.join(tmp, "forms", f"{FORM}.json"), "w", encoding="utf-8") as f:
+        json.dump(CONFIG_FORM, f, ensure_ascii=False)
+
+    try:
+        # Un arranque previo construye static/dist/ y los .pyc: se mide el arranque
+        # de un worker nuevo, no la primera instalación
+        medir_proceso(tmp)
+        mediciones = []
+        for i in range(args.procesos):
+            print(f"Arranque {i + 1}/{args.procesos}...", file=sys.stderr)
+            mediciones.append(medir_proceso(tmp))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    reporte = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "commit": subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                                 capture_output=True, text=True).stdout.strip(),
+        "procesos": args.procesos,
+        "importacion_app": resumen([m["importacion_app"] for m in mediciones]),
+        "primera_respuesta": resumen([m["primera_respuesta"] for m in mediciones]),
+        "primer_qr": resumen([m["primer_qr"] for m in mediciones]),
+        "qr_al_arrancar": any(m["qr_al_arrancar"] for m in mediciones),
+    }
+
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(reporte, f, ensure_ascii=False, indent=2)
+    print(json.dumps(reporte, ensure_ascii=False, indent=2))
+    print(f"Reporte guardado en {salida}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
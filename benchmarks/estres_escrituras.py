@@ -0,0 +1,76 @@
+"""Prueba de estrés de escrituras concurrentes entre procesos.
+
+Lanza varios procesos (como los workers de gunicorn) que llaman a
+`guardar_registro` sobre el mismo formulario y verifica que no se pierda
+ningún registro y que JSONL y CSV queden con las mismas filas.
+
+Uso:
+    python benchmarks/estres_escrituras.py --procesos 8 --registros 200
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+from multiprocessing import Process
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import storage  # noqa: E402
+
+FORM = "estres"
+
+
+def escribir(worker, cantidad):
+    for i in range(cantidad):
+        storage.guardar_registro(FORM, {
+            "Nombre": f"worker {worker}",
+            "Nip": f"{worker}-{i}",
+            "Área de interés": "Informática",
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--procesos", type=int, default=8)
+    parser.add_argument("--registros", type=int, default=200, help="registros por proceso")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DATA_DIR = tmp
+        inicio = time.perf_counter()
+        procesos = [Process(target=escribir, args=(w, args.registros)) for w in range(args.procesos)]
+        for p in procesos:
+            p.start()
+        for p in procesos:
+            p.join()
+        duracion = time.perf_counter() - inicio
+
+        esperados = {f"{w}-{i}" for w in range(args.procesos) for i in range(args.registros)}
+        en_json = [reg["Nip"] for reg in storage.iterar_registros(FORM)]
+        with open(os.path.join(tmp, f"{FORM}.csv"), newline="", encoding="utf-8") as f:
+            en_csv = [fila["Nip"] for fila in csv.DictReader(f)]
+
+        total = len(esperados)
+        print(f"{total} registros en {duracion:.2f}s ({total / duracion:.0f} registros/s)")
+        print(f"JSONL: {len(en_json)}  CSV: {len(en_csv)}")
+
+        errores = []
+        if set(en_json) != esperados or len(en_json) != total:
+            errores.append(f"JSONL: {len(esperados - set(en_json))} perdidos, "
+                           f"{len(en_json) - len(set(en_json))} duplicados")
+        if en_csv != en_json:
+            errores.append("CSV y JSONL no coinciden")
+        if not all(storage.usuario_existe(FORM, "Nip", nip) for nip in esperados):
+            errores.append("El índice de identificadores no ve todos los registros")
+
+        for error in errores:
+            print(f"ERROR: {error}")
+        if errores:
+            sys.exit(1)
+        print("OK: cero registros perdidos")
+
+
+if __name__ == "__main__":
+    main()
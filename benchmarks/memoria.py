@@ -0,0 +1,164 @@
+"""Prueba de memoria acotada con archivos de registros grandes.
+
+Para cada escala crea un data/<form>.json heredado (un arreglo JSON) con N
+registros y, en un proceso nuevo, recorre todos los consumidores de
+registros: migración al log, índice de duplicados, envío nuevo,
+exportaciones CSV/JSON/JSONL, estadísticas, espejo paginado e importación
+de un arreglo JSON de N registros. Mide el pico de memoria (RSS) y verifica
+que no crezca con la cantidad de registros.
+
+Uso:
+    python benchmarks/memoria.py --escalas 20000,200000 --tolerancia-mb 10
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FORM = "memoria"
+CONFIG_FORM = {
+    "titulo": "Memoria",
+    "activo": True,
+    "descripcion": "",
+    "identificador_unico": "Nip",
+    "campos": [
+        {"nombre": "Nombre", "tipo": "text", "obligatorio": True},
+        {"nombre": "Correo", "tipo": "email", "obligatorio": True},
+        {"nombre": "Nip", "tipo": "number", "obligatorio": True},
+        {"nombre": "Área", "tipo": "select", "obligatorio": True, "opciones": ["A", "B", "C"]},
+        {"nombre": "Comentarios", "tipo": "textarea"},
+    ],
+}
+
+
+def registro(i):
+    return {
+        "Nombre": f"Persona {i}",
+        "Correo": f"persona{i}@example.com",
+        "Nip": str(10_000_000 + i),
+        "Área": "ABC"[i % 3],
+        "Comentarios": "Comentario de prueba " * 5,
+        "_fecha": f"2025-01-{1 + i % 28:02d}T10:00:00",
+    }
+
+
+def escribir_arreglo(ruta, registros):
+    """Escribir un arreglo JSON registro por registro (como el formato heredado)"""
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for i, reg in enumerate(registros):
+            f.write((",\n" if i else "") + json.dumps(reg, ensure_ascii=False, indent=4))
+        f.write("\n]\n")
+
+
+def pico_mb():
+    """Pico de memoria residente del proceso (ru_maxrss: KB en Linux, bytes en macOS)"""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def hijo(cantidad):
+    """Recorrer todos los consumidores en este proceso e imprimir los picos en JSON"""
+    sys.path.insert(0, RAIZ)
+    from utils import storage, estadisticas, espejo
+    from utils.exportacion import exportar_csv, exportar_json, exportar_jsonl, columnas_exportacion
+    from utils.formularios import columnas_formulario, obtener_validador
+    from utils.importacion import importar_registros, leer_filas
+
+    picos = {"inicio": pico_mb()}
+    inicio = time.perf_counter()
+
+    storage.migrar_registros(FORM)
+    picos["migracion"] = pico_mb()
+
+    assert storage.usuario_existe(FORM, "Nip", registro(cantidad - 1)["Nip"])
+    assert not storage.usuario_existe(FORM, "Nip", "no-existe")
+    picos["duplicados"] = pico_mb()
+
+    storage.guardar_registro(FORM, registro(cantidad))
+    assert storage.usuario_existe(FORM, "Nip", registro(cantidad)["Nip"])
+    picos["envio"] = pico_mb()
+
+    columnas, registros = columnas_exportacion(storage.iterar_registros(FORM), columnas_formulario(FORM))
+    for fragmento in exportar_csv(registros, columnas):
+        pass
+    for fragmento in exportar_json(storage.iterar_registros(FORM)):
+        pass
+    for fragmento in exportar_jsonl(storage.iterar_registros(FORM)):
+        pass
+    picos["exportacion"] = pico_mb()
+
+    assert estadisticas.obtener_estadisticas(FORM)["total"] == cantidad + 1
+    picos["estadisticas"] = pico_mb()
+
+    assert espejo.pagina_registros(FORM, pagina=2)["total"] == cantidad + 1
+    picos["espejo"] = pico_mb()
+
+    with open("importar.json", "rb") as f:
+        importados, errores = importar_registros(FORM, CONFIG_FORM, obtener_validador(FORM), leer_filas(f, "json"))
+    assert importados == cantidad and not errores, (importados, errores[:3])
+    picos["importacion"] = pico_mb()
+
+    print(json.dumps({"picos_mb": picos, "segundos": time.perf_counter() - inicio}))
+
+
+def medir(cantidad):
+    with tempfile.TemporaryDirectory(prefix="form_web_memoria_") as tmp:
+        os.makedirs(os.path.join(tmp, "data"))
+        os.makedirs(os.path.join(tmp, "forms"))
+        with open(os.path.join(tmp, "forms", f"{FORM}.json"), "w", encoding="utf-8") as f:
+            json.dump(CONFIG_FORM, f, ensure_ascii=False)
+        escribir_arreglo(os.path.join(tmp, "data", f"{FORM}.json"), (registro(i) for i in range(cantidad)))
+        escribir_arreglo(os.path.join(tmp, "importar.json"),
+                         (registro(i) for i in range(cantidad + 1, 2 * cantidad + 1)))
+        tamaño = os.path.getsize(os.path.join(tmp, "data", f"{FORM}.json")) / (1024 * 1024)
+
+        entorno = {**os.environ, "LOG_LEVEL": "WARNING", "FORMS_DIR": "forms"}
+        salida = subprocess.run([sys.executable, os.path.abspath(__file__), "--hijo", str(cantidad)],
+                                cwd=tmp, env=entorno, capture_output=True, text=True)
+        if salida.returncode:
+            raise RuntimeError(salida.stderr)
+        resultado = json.loads(salida.stdout.strip().splitlines()[-1])
+        resultado["archivo_mb"] = round(tamaño, 1)
+        return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--escalas", default="20000,200000", help="registros por escala, separados por coma")
+    parser.add_argument("--tolerancia-mb", type=float, default=10,
+                        help="crecimiento máximo del pico entre la escala menor y la mayor")
+    parser.add_argument("--hijo", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        hijo(args.hijo)
+        return
+
+    crecimientos = {}
+    for cantidad in (int(e) for e in args.escalas.split(",") if e.strip()):
+        print(f"{cantidad} registros...", file=sys.stderr)
+        resultado = medir(cantidad)
+        picos = resultado["picos_mb"]
+        crecimientos[cantidad] = max(picos.values()) - picos["inicio"]
+        detalle = "  ".join(f"{paso}: {valor:.1f}" for paso, valor in picos.items())
+        print(f"{cantidad} registros ({resultado['archivo_mb']} MB, {resultado['segundos']:.1f}s) "
+              f"pico MB -> {detalle}")
+
+    escalas = sorted(crecimientos)
+    diferencia = crecimientos[escalas[-1]] - crecimientos[escalas[0]]
+    print(f"Crecimiento del pico entre {escalas[0]} y {escalas[-1]} registros: {diferencia:.1f} MB")
+    if diferencia > args.tolerancia_mb:
+        print(f"ERROR: la memoria crece con los registros (tolerancia {args.tolerancia_mb} MB)")
+        sys.exit(1)
+    print("OK: memoria acotada")
+
+
+if __name__ == "__main__":
+    main()
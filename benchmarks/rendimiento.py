@@ -0,0 +1,313 @@
+"""Benchmarks reproducibles de los caminos de envío y de administración.
+
+Mide, sobre un directorio temporal con datos sintéticos:
+  - envíos a /formulario/<nombre>: throughput y latencias p50/p99 con
+    1k, 10k y 100k registros existentes (cliente de pruebas de Flask);
+  - costo de usuario_existe (primera consulta y consultas siguientes);
+  - listado de formularios con cientos de archivos en forms/ y GET de un
+    formulario (página en caché);
+  - generación de QR (sin caché y con caché);
+  - opcionalmente (--gunicorn), envíos concurrentes contra gunicorn con
+    varios workers.
+
+El resultado se escribe en JSON (--salida) para comparar corridas.
+
+Uso:
+    python benchmarks/rendimiento.py --escalas 1000,10000,100000 --salida bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FORM = "bench"
+CONFIG_FORM = {
+    "titulo": "Benchmark",
+    "activo": True,
+    "descripcion": "",
+    "identificador_unico": "Nip",
+    "campos": [
+        {"nombre": "Nombre", "tipo": "text", "obligatorio": True},
+        {"nombre": "Correo", "tipo": "email", "obligatorio": True},
+        {"nombre": "Nip", "tipo": "number", "obligatorio": True},
+        {"nombre": "Área", "tipo": "select", "obligatorio": True, "opciones": ["A", "B", "C"]},
+        {"nombre": "Nivel", "tipo": "checkbox", "opciones": ["Básico", "Intermedio", "Avanzado"]},
+        {"nombre": "Comentarios", "tipo": "textarea"},
+    ],
+}
+
+
+def percentiles(muestras):
+    """Resumen de latencias en milisegundos"""
+    if not muestras:
+        return {}
+    ordenadas = sorted(muestras)
+
+    def p(q):
+        return ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))] * 1000
+
+    return {
+        "n": len(ordenadas),
+        "media_ms": round(statistics.fmean(ordenadas) * 1000, 3),
+        "p50_ms": round(p(0.50), 3),
+        "p90_ms": round(p(0.90), 3),
+        "p99_ms": round(p(0.99), 3),
+        "max_ms": round(ordenadas[-1] * 1000, 3),
+    }
+
+
+def registro(i):
+    return {
+        "Nombre": f"Persona {i}",
+        "Correo": f"persona{i}@example.com",
+        "Nip": str(10_000_000 + i),
+        "Área": "ABC"[i % 3],
+        "Nivel": "Básico",
+        "Comentarios": "",
+    }
+
+
+def precargar(data_dir, cantidad):
+    """Escribir directamente `cantidad` registros existentes (JSONL + CSV)"""
+    with open(os.path.join(data_dir, f"{FORM}.jsonl"), "w", encoding="utf-8") as f:
+        for i in range(cantidad):
+            f.write(json.dumps(registro(i), ensure_ascii=False) + "\n")
+    with open(os.path.join(data_dir, f"{FORM}.csv"), "w", encoding="utf-8", newline="") as f:
+        f.write(",".join(registro(0)) + "\n")
+        for i in range(cantidad):
+            f.write(",".join(registro(i).values()) + "\n")
+    for extension in (".stats.json", ".sqlite3"):
+        ruta = os.path.join(data_dir, FORM + extension)
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+
+def bench_envios(app, storage, data_dir, escala, envios):
+    precargar(data_dir, escala)
+    storage.invalidar_indices(FORM)
+    cliente = app.test_client()
+
+    # Primera consulta de duplicados: construye el índice desde el archivo
+    inicio = time.perf_counter()
+    storage.usuario_existe(FORM, "Nip", "no-existe")
+    indice_frio = time.perf_counter() - inicio
+
+    consultas = []
+    for i in range(1000):
+        inicio = time.perf_counter()
+        storage.usuario_existe(FORM, "Nip", str(10_000_000 + (i * 7919) % escala))
+        consultas.append(time.perf_counter() - inicio)
+
+    latencias = []
+    inicio_total = time.perf_counter()
+    for i in range(envios):
+        datos = registro(escala + i)
+        inicio = time.perf_counter()
+        respuesta = cliente.post(f"/formulario/{FORM}", data=datos)
+        latencias.append(time.perf_counter() - inicio)
+        if respuesta.status_code != 200:
+            raise RuntimeError(f"Envío fallido ({respuesta.status_code})")
+    total = time.perf_counter() - inicio_total
+
+    return {
+        "registros_existentes": escala,
+        "envios": envios,
+        "envios_por_segundo": round(envios / total, 1),
+        "latencia_envio": percentiles(latencias),
+        "usuario_existe_primera_ms": round(indice_frio * 1000, 3),
+        "usuario_existe": percentiles(consultas),
+    }
+
+
+def bench_listado(app, forms_dir, cantidad, repeticiones=50):
+    for i in range(cantidad):
+        with open(os.path.join(forms_dir, f"extra_{i}.json"), "w", encoding="utf-8") as f:
+            json.dump({**CONFIG_FORM, "titulo": f"Extra {i}"}, f, ensure_ascii=False)
+
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion["logged_in"] = True
+
+    resultados = {"formularios": cantidad + 1}
+    for ruta in ("/", "/admin/formularios", "/admin/qr-generator", f"/formulario/{FORM}"):
+        latencias = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            cliente.get(ruta)
+            latencias.append(time.perf_counter() - inicio)
+        resultados[ruta] = {"primera_ms": round(latencias[0] * 1000, 3), **percentiles(latencias[1:])}
+    return resultados
+
+
+def bench_qr(repeticiones=50):
+    from utils.qr import generar_qr_png
+
+    frio = []
+    for i in range(repeticiones):
+        url = f"http://localhost/formulario/qr_{i}"
+        inicio = time.perf_counter()
+        generar_qr_png(url, box_size=10, border=4)
+        frio.append(time.perf_counter() - inicio)
+
+    caliente = []
+    for i in range(repeticiones):
+        inicio = time.perf_counter()
+        generar_qr_png(f"http://localhost/formulario/qr_{i}", box_size=10, border=4)
+        caliente.append(time.perf_counter() - inicio)
+
+    return {"sin_cache": percentiles(frio), "con_cache": percentiles(caliente)}
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def bench_gunicorn(tmp, workers, envios, hilos):
+    """Envíos concurrentes contra gunicorn con varios workers"""
+    puerto = _puerto_libre()
+    entorno = {**os.environ, "FLASK_ENV": "production", "LOG_LEVEL": "WARNING"}
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-w", str(workers), "-b", f"127.0.0.1:{puerto}",
+         "--pythonpath", RAIZ, "app:app"],
+        cwd=tmp, env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{puerto}/formulario/{FORM}"
+    try:
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(url, timeout=1).read()
+                break
+            except OSError:
+                time.sleep(0.1)
+        else:
+            raise RuntimeError("gunicorn no respondió")
+
+        latencias = []
+        errores = []
+        siguiente = iter(range(envios))
+        lock = threading.Lock()
+
+        def trabajar():
+            while True:
+                with lock:
+                    i = next(siguiente, None)
+                if i is None:
+                    return
+                cuerpo = urllib.parse.urlencode(registro(5_000_000 + i)).encode()
+                inicio = time.perf_counter()
+                try:
+                    urllib.request.urlopen(url, data=cuerpo, timeout=30).read()
+                except OSError as e:
+                    errores.append(str(e))
+                latencias.append(time.perf_counter() - inicio)
+
+        inicio_total = time.perf_counter()
+        hilos_trabajo = [threading.Thread(target=trabajar) for _ in range(hilos)]
+        for hilo in hilos_trabajo:
+            hilo.start()
+        for hilo in hilos_trabajo:
+            hilo.join()
+        total = time.perf_counter() - inicio_total
+    finally:
+        proceso.terminate()
+        proceso.wait()
+
+    return {
+        "workers": workers,
+        "hilos_cliente": hilos,
+        "envios": envios,
+        "errores": len(errores),
+        "envios_por_segundo": round(envios / total, 1),
+        "latencia_envio": percentiles(latencias),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--escalas", default="1000,10000,100000",
+                        help="registros existentes antes de medir, separados por coma")
+    parser.add_argument("--envios", type=int, default=200, help="envíos medidos por escala")
+    parser.add_argument("--formularios", type=int, default=300, help="archivos en forms/ para el listado")
+    parser.add_argument("--gunicorn", action="store_true", help="medir también con gunicorn multi-worker")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--escritura-diferida", action="store_true",
+                        help="confirmar envíos en el diario y guardarlos en segundo plano")
+    parser.add_argument("--salida", default="bench_resultados.json")
+    args = parser.parse_args()
+
+    salida = os.path.abspath(args.salida)
+    tmp = tempfile.mkdtemp(prefix="form_web_bench_")
+    data_dir = os.path.join(tmp, "data")
+    forms_dir = os.path.join(tmp, "forms")
+    os.makedirs(data_dir)
+    os.makedirs(forms_dir)
+    with open(os.path.join(forms_dir, f"{FORM}.json"), "w", encoding="utf-8") as f:
+        json.dump(CONFIG_FORM, f, ensure_ascii=False)
+
+    # La app toma data/ y forms/ relativos al directorio de trabajo
+    os.chdir(tmp)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # Todos los envíos salen de la misma IP: se mide el guardado, no los límites
+    os.environ.setdefault("LIMITE_ENVIOS_IP", "0")
+    os.environ.setdefault("LIMITE_ENVIOS_FORMULARIO", "0")
+    if args.escritura_diferida:
+        os.environ["ESCRITURA_DIFERIDA"] = "1"
+    sys.path.insert(0, RAIZ)
+    try:
+        inicio = time.perf_counter()
+        from app import app
+        from utils import storage
+        importacion = time.perf_counter() - inicio
+
+        reporte = {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "commit": subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                                     capture_output=True, text=True).stdout.strip(),
+            "importacion_app_ms": round(importacion * 1000, 3),
+            "escritura_diferida": app.config["ESCRITURA_DIFERIDA"],
+            "envios": [],
+        }
+
+        for escala in (int(e) for e in args.escalas.split(",") if e.strip()):
+            print(f"Envíos con {escala} registros existentes...", file=sys.stderr)
+            reporte["envios"].append(bench_envios(app, storage, data_dir, escala, args.envios))
+
+        print(f"Listado con {args.formularios} formularios...", file=sys.stderr)
+        reporte["listado"] = bench_listado(app, forms_dir, args.formularios)
+
+        print("Generación de QR...", file=sys.stderr)
+        reporte["qr"] = bench_qr()
+
+        if args.gunicorn:
+            print(f"gunicorn con {args.workers} workers...", file=sys.stderr)
+            precargar(data_dir, 0)
+            reporte["gunicorn"] = bench_gunicorn(tmp, args.workers, args.envios, hilos=args.workers * 2)
+    finally:
+        os.chdir(RAIZ)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(reporte, f, ensure_ascii=False, indent=2)
+    print(json.dumps(reporte, ensure_ascii=False, indent=2))
+    print(f"Reporte guardado en {salida}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
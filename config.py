@@ -12,6 +12,32 @@ class Config:
     ADMIN_PASS = os.getenv("ADMIN_PASS", "12345")
     FORMS_DIR = os.getenv("FORMS_DIR", "forms")
     DATA_DIR = os.getenv("DATA_DIR", "data")
+    # Backend de almacenamiento: "archivos" (JSONL + CSV) o "sqlite"
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "archivos")
+    # Backend de archivos: MB del log activo a partir de los cuales se archiva solo (0 = solo a mano)
+    ARCHIVAR_MB = float(os.getenv("ARCHIVAR_MB", "0"))
+    # Escritura diferida: confirmar envíos en un diario y guardarlos por lotes en segundo plano
+    ESCRITURA_DIFERIDA = os.getenv("ESCRITURA_DIFERIDA", "0").lower() in ("1", "true", "si")
+    # Envíos por minuto a los formularios públicos (0 = sin límite).
+    # Por IP viene desactivado: en un evento muchos asistentes comparten la
+    # misma IP (Wi-Fi o NAT) y escanean el QR a la vez; activarlo solo con un
+    # valor holgado para la cantidad de personas detrás de una misma red.
+    LIMITE_ENVIOS_IP = int(os.getenv("LIMITE_ENVIOS_IP", "0"))
+    # Por formulario: tope total de todas las IPs juntas
+    LIMITE_ENVIOS_FORMULARIO = int(os.getenv("LIMITE_ENVIOS_FORMULARIO", "600"))
+    # Segundos en los que un reenvío idéntico de la misma IP se descarta (0 = desactivado)
+    VENTANA_REENVIOS = float(os.getenv("VENTANA_REENVIOS", "10"))
+    # Proxies delante de la app (Render: 1) para tomar la IP real de X-Forwarded-For
+    PROXIES_CONFIABLES = int(os.getenv("PROXIES_CONFIABLES", "0"))
+    # Sesiones de administrador: "cookie" (firmada, por defecto) o "sqlite" (data/sesiones.db)
+    SESIONES = os.getenv("SESIONES", "cookie")
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    # Token opcional para que Prometheus lea /admin/metrics sin sesión
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+    # Token opcional para que consumidores externos lean /api/cambios sin sesión
+    CAMBIOS_TOKEN = os.getenv("CAMBIOS_TOKEN", "")
+    # Segundos máximos que queda abierta una lectura de cambios (long-poll o stream SSE)
+    CAMBIOS_ESPERA_MAXIMA = float(os.getenv("CAMBIOS_ESPERA_MAXIMA", "30"))
 
 
 class DevelopmentConfig(Config):
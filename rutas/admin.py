@@ -0,0 +1,423 @@
+import os
+import hmac
+import json
+import csv
+from functools import wraps
+
+from flask import (Blueprint, current_app, render_template, request, redirect, url_for, flash, jsonify,
+                   send_file, session, Response, stream_with_context)
+
+from utils.storage import (eliminar_registros, iterar_registros, existen_registros, listar_datos, archivo_descarga,
+                           archivar_registros, permite_archivar)
+from utils.estadisticas import obtener_estadisticas, campos_con_conteo, eliminar_estadisticas
+from utils.espejo import pagina_registros, eliminar_espejo
+from utils.importacion import detectar_formato, leer_filas, importar_registros, LOTE_IMPORTACION
+from utils.claves import error_claves
+from utils.exportacion import FORMATOS, filtrar_registros, columnas_exportacion, exportar_csv, exportar_jsonl, exportar_json, comprimir_gzip
+from utils.metricas import exportar_prometheus, logger
+from utils.formularios import (obtener_formulario, obtener_validador, listar_formularios, guardar_formulario,
+                               borrar_formulario, columnas_formulario, ruta_formulario)
+
+# Sesión de administrador, panel, edición de formularios y descarga de datos
+admin = Blueprint("admin", __name__)
+
+
+def login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not session.get("logged_in"):
+            flash("Debes iniciar sesión para acceder al panel.", "error")
+            return redirect(url_for("admin.login"))
+        return f(*args, **kwargs)
+    return decorated_function
+
+@admin.route("/login", methods=["GET", "POST"])
+def login():
+    if request.method == "POST":
+        usuario = request.form["usuario"]
+        password = request.form["password"]
+
+        if usuario == current_app.config["ADMIN_USER"] and password == current_app.config["ADMIN_PASS"]:
+            session["logged_in"] = True
+            session.regenerar = True  # Identificador nuevo al subir de privilegios (sesiones en servidor)
+            flash("Bienvenido al panel administrativo.", "success")
+            return redirect(url_for("publico.index"))
+        else:
+            flash("Usuario o contraseña incorrectos.", "error")
+
+    return render_template("login.html")
+
+
+@admin.route("/logout")
+def logout():
+    session.pop("logged_in", None)
+    session.regenerar = True
+    flash("Sesión cerrada correctamente.", "info")
+    return redirect(url_for("admin.login"))
+
+@admin.route("/admin")
+@login_required
+def admin_dashboard():
+    return render_template("admin_dashboard.html")
+
+
+@admin.route("/admin/registros")
+@login_required
+def admin_registros():
+    return render_template("registros.html", archivos=listar_datos(), permite_archivar=permite_archivar())
+
+
+@admin.route("/admin/registros/<nombre>")
+@login_required
+def admin_registros_formulario(nombre):
+    """Registros de un formulario paginados, con orden y búsqueda por campo"""
+    if not existen_registros(nombre):
+        return f"No se encontraron registros de '{nombre}'.", 404
+    orden = request.args.get("orden") or None
+    descendente = request.args.get("desc") == "1"
+    buscar = request.args.get("buscar", "").strip() or None
+    campo_busqueda = request.args.get("campo") or None
+
+    resultado = pagina_registros(
+        nombre,
+        pagina=request.args.get("pagina", 1, type=int),
+        orden=orden,
+        descendente=descendente,
+        buscar=buscar,
+        campo_busqueda=campo_busqueda,
+    )
+    return render_template(
+        "registros_formulario.html",
+        nombre=nombre,
+        resultado=resultado,
+        orden=orden,
+        descendente=descendente,
+        buscar=buscar,
+        campo_busqueda=campo_busqueda,
+    )
+
+
+@admin.route("/admin/estadisticas/<nombre>")
+@login_required
+def admin_estadisticas(nombre):
+    """Totales, registros en el tiempo y conteo de respuestas (select/radio/checkbox)"""
+    stats = obtener_estadisticas(nombre)
+    campos = campos_con_conteo(nombre)
+
+    if request.args.get("formato") == "json":
+        return jsonify({
+            "total": stats["total"],
+            "sin_fecha": stats["sin_fecha"],
+            "por_dia": stats["por_dia"],
+            "por_hora": stats["por_hora"],
+            "valores": {campo: stats["valores"].get(campo, {}) for campo in campos},
+        })
+
+    try:
+        config = obtener_formulario(nombre) or {}
+    except json.JSONDecodeError:
+        config = {}
+    return render_template("estadisticas.html", nombre=nombre, titulo=config.get("titulo", nombre),
+                           stats=stats, campos=campos)
+
+
+@admin.route("/admin/metrics")
+def admin_metrics():
+    """Métricas en formato de texto de Prometheus (sesión de admin o token Bearer)"""
+    token = current_app.config["METRICS_TOKEN"]
+    encabezado = request.headers.get("Authorization", "")
+    autorizado = session.get("logged_in") or (
+        token and hmac.compare_digest(encabezado.encode("utf-8"), f"Bearer {token}".encode("utf-8"))
+    )
+    if not autorizado:
+        return "No autorizado", 401
+    return Response(exportar_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+
+# -----------------------
+# Formulario dinámico
+# -----------------------
+@admin.route("/admin/formularios")
+@login_required
+def admin_formularios():
+    """Lista todos los formularios para administración"""
+    formularios = []
+
+    for nombre, config in listar_formularios():
+        # Obtener el número de campos
+        campos_count = len(config.get("campos", []))
+
+        formularios.append({
+            "nombre": nombre,
+            "archivo": f"{nombre}.json",
+            "titulo": config.get("titulo", nombre),
+            "descripcion": config.get("descripcion", ""),
+            "activo": config.get("activo", True),
+            "campos": campos_count  # <- Agregar esta línea
+        })
+
+    return render_template("admin_formularios.html", formularios=formularios)
+
+@admin.route("/admin/formulario/<nombre>", methods=["GET", "POST"])
+@login_required
+def editar_formulario(nombre):
+    """Editar un formulario específico"""
+    if not os.path.exists(ruta_formulario(nombre)):
+        return jsonify({"success": False, "error": f"No se encontró el formulario '{nombre}'."}), 404
+
+    try:
+        if request.method == "POST":
+            # Obtener los datos del formulario de edición
+            config_data = request.get_json()
+            
+            # Validar estructura básica
+            if not config_data or "titulo" not in config_data:
+                return jsonify({"success": False, "error": "Estructura inválida"}), 400
+            error = error_claves(config_data)
+            if error:
+                return jsonify({"success": False, "error": error}), 400
+            
+            # Guardar el archivo (invalida la caché del formulario)
+            guardar_formulario(nombre, config_data)
+            
+            return jsonify({"success": True, "message": "Formulario actualizado correctamente"})
+
+        # GET request - cargar el formulario existente
+        config = obtener_formulario(nombre)
+        
+        return jsonify(config)
+        
+    except json.JSONDecodeError as e:
+        return jsonify({"success": False, "error": f"Error en el formato JSON del archivo: {str(e)}"}), 500
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Error interno del servidor: {str(e)}"}), 500
+
+@admin.route("/admin/formulario/nuevo", methods=["POST"])
+@login_required
+def nuevo_formulario():
+    """Crear un nuevo formulario"""
+    try:
+        data = request.get_json()
+        
+        if not data:
+            logger.warning("Nuevo formulario: no se recibieron datos JSON (Content-Type: %s)", request.content_type)
+            return jsonify({"success": False, "error": "No se recibieron datos"}), 400
+            
+        nombre = data.get("nombre")
+        titulo = data.get("titulo", nombre)
+        
+        if not nombre:
+            logger.warning("Nuevo formulario: nombre vacío")
+            return jsonify({"success": False, "error": "El nombre es requerido"}), 400
+        
+        # Validar que el nombre sea válido para archivo
+        nombre_archivo = "".join(c for c in nombre if c.isalnum() or c in (' ', '-', '_')).strip()
+        nombre_archivo = nombre_archivo.replace(' ', '_').lower()
+        
+        ruta = ruta_formulario(nombre_archivo)
+        
+        if os.path.exists(ruta):
+            logger.warning("Nuevo formulario: ya existe %s", ruta)
+            return jsonify({"success": False, "error": "Ya existe un formulario con ese nombre"}), 400
+        
+        # Estructura básica del formulario
+        nuevo_formulario = {
+            "titulo": titulo,
+            "activo": True,
+            "descripcion": "",
+            "campos": []
+        }
+        
+        guardar_formulario(nombre_archivo, nuevo_formulario)
+        
+        logger.info("Nuevo formulario creado: %s (%s)", nombre_archivo, titulo)
+        return jsonify({
+            "success": True, 
+            "message": "Formulario creado correctamente", 
+            "nombre": nombre_archivo
+        })
+        
+    except Exception as e:
+        logger.exception("Error al crear formulario")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@admin.route("/admin/formulario/<nombre>/importar", methods=["POST"])
+@login_required
+def importar_formulario(nombre):
+    """Importar registros en lote desde un archivo CSV, JSON Lines o arreglo JSON (campo `archivo`)"""
+    try:
+        config = obtener_formulario(nombre)
+    except json.JSONDecodeError as e:
+        return jsonify({"success": False, "error": f"Error en el formato JSON del archivo: {str(e)}"}), 500
+    if config is None:
+        return jsonify({"success": False, "error": f"No se encontró el formulario '{nombre}'."}), 404
+
+    archivo = request.files.get("archivo")
+    if not archivo:
+        return jsonify({"success": False, "error": "No se recibió ningún archivo"}), 400
+
+    formato = detectar_formato(archivo.filename, request.form.get("formato"))
+    if not formato:
+        return jsonify({"success": False, "error": "Formato no soportado: use CSV, JSON Lines o JSON"}), 400
+
+    try:
+        importados, errores = importar_registros(
+            nombre, config, obtener_validador(nombre), leer_filas(archivo.stream, formato)
+        )
+    except (UnicodeDecodeError, csv.Error) as e:
+        return jsonify({"success": False, "error": f"No se pudo leer el archivo: {str(e)}"}), 400
+
+    logger.info("Importación en %s: %d importados, %d rechazados", nombre, importados, len(errores))
+    return jsonify({
+        "success": True,
+        "importados": importados,
+        "rechazados": len(errores),
+        "errores": errores,
+        # Las filas válidas se confirman en lotes independientes (no todo o nada)
+        "lote": LOTE_IMPORTACION,
+    })
+
+@admin.route("/admin/formulario/<nombre>/eliminar", methods=["POST"])
+@login_required
+def eliminar_formulario(nombre):
+    """Eliminar un formulario"""
+    try:
+        if borrar_formulario(nombre):
+            return jsonify({"success": True, "message": "Formulario eliminado correctamente"})
+        else:
+            return jsonify({"success": False, "error": "Formulario no encontrado"})
+            
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)})
+    
+def verificar_archivo_formulario(ruta):
+    """Verifica que el archivo de formulario exista y sea JSON válido"""
+    if not os.path.exists(ruta):
+        return False, "El archivo no existe"
+    
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            json.load(f)
+        return True, "OK"
+    except json.JSONDecodeError as e:
+        return False, f"JSON inválido: {str(e)}"
+    except Exception as e:
+        return False, f"Error al leer archivo: {str(e)}"
+
+
+def columnas_csv(nombre):
+    """Unión de columnas de todas las versiones del formulario ([] si no hay definición válida)"""
+    try:
+        return columnas_formulario(nombre)
+    except json.JSONDecodeError:
+        return []
+
+
+@admin.route("/descargar/<nombre>")
+@login_required
+def descargar(nombre):
+    """Descargar el CSV guardado o, si el backend no guarda archivos, generarlo al vuelo"""
+    ruta = archivo_descarga(nombre)
+    if ruta:
+        return send_file(ruta, as_attachment=True, download_name=os.path.basename(ruta))
+
+    form_name, extension = os.path.splitext(nombre)
+    if extension not in (".csv", ".json") or not existen_registros(form_name):
+        return f"No se encontró el archivo '{nombre}'.", 404
+
+    if extension == ".json":
+        contenido, mimetype = exportar_json(iterar_registros(form_name)), "application/json"
+    else:
+        columnas, registros = columnas_exportacion(iterar_registros(form_name), columnas_csv(form_name))
+        contenido, mimetype = exportar_csv(registros, columnas), "text/csv"
+
+    return Response(
+        stream_with_context(contenido),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={nombre}"},
+    )
+
+@admin.route("/admin/exportar/<nombre>")
+@login_required
+def exportar(nombre):
+    """Exportar registros en streaming, con columnas, filtros y rango de fechas.
+
+    Parámetros: formato=csv|jsonl, gzip=1, columnas=A,B, filtro=Campo:valor
+    (repetible), desde/hasta=AAAA-MM-DD.
+    """
+    if not os.path.exists(ruta_formulario(nombre)) and not existen_registros(nombre):
+        return jsonify({"success": False, "error": f"No se encontró el formulario '{nombre}'."}), 404
+
+    formato = request.args.get("formato", "csv")
+    if formato not in FORMATOS:
+        return jsonify({"success": False, "error": f"Formato no soportado: {formato}"}), 400
+
+    filtros = []
+    for filtro in request.args.getlist("filtro"):
+        campo, separador, valor = filtro.partition(":")
+        if not separador:
+            return jsonify({"success": False, "error": f"Filtro inválido: {filtro}"}), 400
+        filtros.append((campo, valor))
+
+    columnas = [c.strip() for c in request.args.get("columnas", "").split(",") if c.strip()]
+    desde = request.args.get("desde") or None
+    hasta = request.args.get("hasta") or None
+    comprimir = request.args.get("gzip") in ("1", "true", "si")
+
+    registros = filtrar_registros(iterar_registros(nombre), filtros, desde, hasta)
+
+    if formato == "csv":
+        if not columnas:
+            columnas, registros = columnas_exportacion(registros, columnas_csv(nombre))
+        contenido = exportar_csv(registros, columnas)
+    else:
+        contenido = exportar_jsonl(registros, columnas)
+
+    mimetype, extension = FORMATOS[formato]
+    nombre_archivo = f"{nombre}.{extension}"
+    if comprimir:
+        contenido = comprimir_gzip(contenido)
+        mimetype = "application/gzip"
+        nombre_archivo += ".gz"
+
+    return Response(
+        stream_with_context(contenido),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={nombre_archivo}"},
+    )
+
+@admin.route("/eliminar/<nombre>")
+@login_required
+def eliminar(nombre):
+    form_name = os.path.splitext(nombre)[0]
+    if existen_registros(form_name):
+        eliminar_registros(form_name)
+        eliminar_espejo(form_name)
+        eliminar_estadisticas(form_name)
+        #flash(f"El archivo JSON asociado a '{nombre}' ha sido eliminado.", "success")
+        return render_template("components/eliminar.html", nombre=nombre)
+    else:
+        flash(f"El archivo '{nombre}' no se encontró.", "error")
+    return redirect(url_for(".admin_registros"))
+
+
+@admin.route("/archivar/<nombre>")
+@login_required
+def archivar(nombre):
+    """Sellar los registros actuales en un segmento comprimido (data/archivo/<form>/)"""
+    form_name = os.path.splitext(nombre)[0]
+    if not existen_registros(form_name):
+        flash(f"El archivo '{nombre}' no se encontró.", "error")
+        return redirect(url_for(".admin_registros"))
+
+    if not permite_archivar():
+        flash("El almacenamiento configurado no permite archivar.", "error")
+        return redirect(url_for(".admin_registros"))
+
+    segmento = archivar_registros(form_name)
+    if segmento is None:
+        flash(f"'{form_name}' no tiene registros nuevos para archivar.", "error")
+    else:
+        flash(f"{segmento['registros']} registros archivados en {segmento['archivo']}.", "success")
+    return redirect(url_for(".admin_registros"))
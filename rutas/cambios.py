@@ -0,0 +1,105 @@
+import hmac
+import json
+import time
+
+from flask import Blueprint, current_app, jsonify, request, session, Response
+
+from utils.cambios import leer_cambios, codificar_cursor, decodificar_cursor, CursorInvalido, CURSOR_FIN, LIMITE
+from utils.storage import existen_registros
+from utils.formularios import obtener_formulario
+
+# Feed de cambios para consumidores externos (sesión de admin o token Bearer):
+# lectura incremental por cursor, long-poll y Server-Sent Events
+cambios = Blueprint("cambios", __name__)
+
+# Segundos entre comentarios de mantenimiento en el stream (proxies que cortan conexiones quietas)
+LATIDO = 15
+
+
+def _autorizado():
+    token = current_app.config["CAMBIOS_TOKEN"]
+    encabezado = request.headers.get("Authorization", "")
+    return session.get("logged_in") or (
+        token and hmac.compare_digest(encabezado.encode("utf-8"), f"Bearer {token}".encode("utf-8"))
+    )
+
+
+def _validar(nombre, cursor):
+    """Respuesta de error si no se puede leer el feed, o None"""
+    if not _autorizado():
+        return jsonify({"success": False, "error": "No autorizado"}), 401
+    if obtener_formulario(nombre) is None and not existen_registros(nombre):
+        return jsonify({"success": False, "error": f"No se encontró el formulario '{nombre}'"}), 404
+    if cursor and cursor != CURSOR_FIN:
+        try:
+            decodificar_cursor(cursor)
+        except CursorInvalido as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+    return None
+
+
+# -----------------------
+# Lectura incremental y long-poll
+# -----------------------
+@cambios.route("/api/cambios/<nombre>")
+def leer(nombre):
+    """Registros posteriores a `cursor` (hasta `limite`); con `espera` segundos
+    la respuesta queda abierta hasta que llegue alguno"""
+    cursor = request.args.get("cursor")
+    error = _validar(nombre, cursor)
+    if error:
+        return error
+
+    limite = request.args.get("limite", LIMITE, type=int)
+    espera = min(request.args.get("espera", 0, type=float), current_app.config["CAMBIOS_ESPERA_MAXIMA"])
+    resultado = leer_cambios(nombre, cursor, limite, max(0, espera))
+
+    respuesta = jsonify({
+        "success": True,
+        "registros": [registro for registro, _ in resultado["cambios"]],
+        "cursor": resultado["cursor"],
+        "reiniciado": resultado["reiniciado"],
+        "mas": resultado["mas"],
+    })
+    respuesta.cache_control.no_store = True
+    return respuesta
+
+
+# -----------------------
+# Server-Sent Events
+# -----------------------
+@cambios.route("/api/cambios/<nombre>/stream")
+def stream(nombre):
+    """Registros nuevos como eventos SSE. El id de cada evento es el cursor tras
+    el registro: al reconectar, EventSource lo envía en Last-Event-ID. La
+    conexión se cierra tras CAMBIOS_ESPERA_MAXIMA segundos para no retener un
+    worker indefinidamente; el cliente reconecta solo."""
+    cursor = request.headers.get("Last-Event-ID") or request.args.get("cursor")
+    error = _validar(nombre, cursor)
+    if error:
+        return error
+    duracion = current_app.config["CAMBIOS_ESPERA_MAXIMA"]
+
+    def eventos(cursor):
+        hasta = time.monotonic() + duracion
+        yield "retry: 1000\n\n"
+        while True:
+            restante = hasta - time.monotonic()
+            if restante <= 0:
+                return
+            resultado = leer_cambios(nombre, cursor, espera=min(restante, LATIDO))
+            cursor = resultado["cursor"]
+            if resultado["reiniciado"]:
+                # Los datos se reemplazaron: el consumidor debe descartar lo sincronizado.
+                # El id apunta al inicio de la nueva generación por si se corta aquí
+                inicio = codificar_cursor(decodificar_cursor(cursor)[0], 0)
+                yield f"event: reinicio\nid: {inicio}\ndata: {{}}\n\n"
+            for registro, cursor_registro in resultado["cambios"]:
+                yield f"id: {cursor_registro}\ndata: {json.dumps(registro, ensure_ascii=False)}\n\n"
+            if not resultado["cambios"]:
+                yield ": latido\n\n"
+
+    respuesta = Response(eventos(cursor), mimetype="text/event-stream")
+    respuesta.cache_control.no_store = True
+    respuesta.headers["X-Accel-Buffering"] = "no"
+    return respuesta
@@ -0,0 +1,121 @@
+import time
+
+from flask import Blueprint, current_app, render_template, request, Response
+
+from utils.storage import guardar_registro, registro_duplicado, RegistroDuplicado
+from utils import diferida, limites
+from utils.claves import describir
+from utils.formularios import obtener_formulario, obtener_validador, listar_formularios, pagina_formulario
+from rutas.admin import login_required
+
+# Inicio y formularios públicos (los que se abren al escanear un QR). Las
+# vistas de formularios no usan la sesión: los errores se muestran en la misma
+# página (sin flash), así no firman cookies ni responden Set-Cookie o Vary: Cookie
+publico = Blueprint("publico", __name__)
+
+# Arranque del proceso: Last-Modified mínimo de las páginas de formulario
+INICIO_APP = time.time()
+
+
+# -----------------------
+# Página principal: listar formularios activos
+# -----------------------
+@publico.route("/")
+@login_required
+def index():
+    formularios = []
+    for nombre, config in listar_formularios():
+        if not config.get("activo", True):
+            continue  # No mostrar formularios desactivados
+        formularios.append({
+            "nombre": nombre,
+            "titulo": config.get("titulo", nombre),
+            "descripcion": config.get("descripcion", "")
+        })
+
+    return render_template("index.html", formularios=formularios)
+
+def _procesar_envio(nombre, config, huella):
+    """Validar y guardar un envío ya admitido por los límites"""
+    errores_generales = []  # Para errores que no son de un campo específico
+
+    # Validaciones por campo con el validador precompilado del formulario
+    datos, errores_por_campo = obtener_validador(nombre).validar(request.form)
+
+    # Validación de duplicados por las claves únicas del formulario (error general)
+    clave = registro_duplicado(nombre, datos)
+    if clave is None and current_app.config["ESCRITURA_DIFERIDA"]:
+        clave = diferida.pendiente_duplicado(nombre, datos)
+    if clave is not None:
+        errores_generales.append(f"Ya existe un registro con {describir(clave, datos)}")
+
+    if errores_por_campo or errores_generales:
+        limites.liberar_envio(huella)
+        # Errores por campo y generales en la misma página
+        return render_template("form.html", config=config, datos=datos, errores=errores_por_campo,
+                               errores_generales=errores_generales, sin_sesion=True)
+
+    # Guardar registro (el backend también rechaza duplicados concurrentes)
+    try:
+        if current_app.config["ESCRITURA_DIFERIDA"]:
+            diferida.encolar(nombre, datos)
+        else:
+            guardar_registro(nombre, datos)
+    except RegistroDuplicado as e:
+        limites.liberar_envio(huella)
+        return render_template("form.html", config=config, datos=datos, errores=errores_por_campo,
+                               errores_generales=[str(e)], sin_sesion=True)
+    return render_template("components/success.html", titulo=config["titulo"], form_name=nombre,
+                           sin_sesion=True)
+
+
+@publico.route("/formulario/<nombre>", methods=["GET", "POST"])
+def formulario(nombre):
+    config = obtener_formulario(nombre)
+    if config is None:
+        return f"No se encontró el formulario '{nombre}'.", 404
+
+    if not config.get("activo", True):
+        #return "Este formulario no está disponible en este momento.", 403
+        return render_template("components/form_inactivo.html", titulo=config.get("titulo", nombre), sin_sesion=True)
+     
+
+    datos = {}  # Para mantener los valores ingresados
+    errores_por_campo = {}  # Nuevo: diccionario para errores por campo
+
+    if request.method == "POST":
+        # Límites por IP y por formulario, y reenvíos idénticos (doble clic),
+        # antes de validar y guardar
+        espera = limites.permitir_envio(nombre, request.remote_addr, current_app.config["LIMITE_ENVIOS_IP"],
+                                        current_app.config["LIMITE_ENVIOS_FORMULARIO"])
+        if espera:
+            segundos = int(espera) + 1
+            return (f"Demasiados envíos. Intenta de nuevo en {segundos} segundos.", 429,
+                    {"Retry-After": str(segundos)})
+        huella = limites.huella_envio(nombre, request.remote_addr, request.form)
+        if limites.envio_repetido(huella, current_app.config["VENTANA_REENVIOS"]):
+            return render_template("components/success.html", titulo=config["titulo"], form_name=nombre,
+                                   sin_sesion=True)
+
+        # Si el guardado falla por cualquier motivo, la huella se olvida: un
+        # reintento idéntico no debe darse por guardado
+        try:
+            return _procesar_envio(nombre, config, huella)
+        except BaseException:
+            limites.liberar_envio(huella)
+            raise
+
+    # GET request: página en caché hasta que se edite el formulario, con
+    # ETag/Last-Modified para responder 304 a escaneos repetidos y CDNs. Es la
+    # misma para todos (no depende de la sesión), así que se puede cachear en público
+    html, etag, modificado = pagina_formulario(
+        nombre, "publico",
+        lambda: render_template("form.html", config=config, datos={}, errores={}, sin_sesion=True),
+    )
+    respuesta = Response(html, mimetype="text/html")
+    respuesta.set_etag(etag)
+    # Los templates y assets pueden cambiar con un despliegue: nunca antes del arranque
+    respuesta.last_modified = max(modificado, INICIO_APP)
+    respuesta.cache_control.no_cache = True
+    respuesta.cache_control.public = True
+    return respuesta.make_conditional(request)
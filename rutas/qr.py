@@ -0,0 +1,123 @@
+import base64
+from io import BytesIO
+
+from flask import Blueprint, render_template, request, jsonify, send_file, Response
+
+from utils.formularios import listar_formularios
+from rutas.admin import login_required
+
+# Generación de códigos QR. utils.qr (qrcode y Pillow) se importa en cada
+# vista: cargarlo al arrancar retrasa el primer request de un arranque en frío
+qr = Blueprint("qr", __name__)
+
+
+@qr.route("/admin/qr-generator")
+@login_required
+def qr_generator():
+    """Página para generar códigos QR de formularios"""
+    formularios = []
+    
+    for nombre, config in listar_formularios():
+        formularios.append({
+            "nombre": nombre,
+            "titulo": config.get("titulo", nombre),
+            "descripcion": config.get("descripcion", ""),
+            "activo": config.get("activo", True)
+        })
+    
+    return render_template("qr_generator.html", formularios=formularios)
+
+# Los QR solo dependen de la URL: los navegadores pueden reutilizarlos un día
+QR_MAX_AGE = 86400
+
+@qr.route("/admin/generar-qr/<nombre_formulario>")
+@login_required
+def generar_qr(nombre_formulario):
+    """Genera y devuelve un código QR para un formulario específico"""
+    from utils.qr import generar_qr_png
+
+    try:
+        # Construir la URL del formulario
+        base_url = request.host_url.rstrip('/')
+        formulario_url = f"{base_url}/formulario/{nombre_formulario}"
+        
+        # Crear el código QR (en caché por URL y tamaño)
+        png, etag = generar_qr_png(formulario_url, box_size=10, border=4)
+        
+        # ETag fuerte + GET condicional: responde 304 si el navegador ya lo tiene
+        response = send_file(BytesIO(png), mimetype='image/png', download_name=f'qr_{nombre_formulario}.png',
+                             etag=etag, max_age=QR_MAX_AGE, conditional=True)
+        response.cache_control.public = False
+        response.cache_control.private = True
+        return response
+        
+    except Exception as e:
+        return f"Error al generar QR: {str(e)}", 500
+
+@qr.route("/admin/generar-qr-base64/<nombre_formulario>")
+@login_required
+def generar_qr_base64(nombre_formulario):
+    """Genera un código QR en base64 para mostrar directamente en HTML"""
+    from utils.qr import generar_qr_png
+
+    try:
+        # Construir la URL del formulario
+        base_url = request.host_url.rstrip('/')
+        formulario_url = f"{base_url}/formulario/{nombre_formulario}"
+        
+        # Crear el código QR (en caché por URL y tamaño)
+        png, etag = generar_qr_png(formulario_url, box_size=8, border=2)
+        
+        # Convertir a base64
+        img_data = base64.b64encode(png).decode()
+        
+        response = jsonify({
+            "success": True,
+            "qr_image": f"data:image/png;base64,{img_data}",
+            "formulario_url": formulario_url,
+            "nombre_formulario": nombre_formulario
+        })
+        response.set_etag(f"b64-{etag}")
+        response.cache_control.private = True
+        response.cache_control.max_age = QR_MAX_AGE
+        return response.make_conditional(request)
+        
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@qr.route("/admin/generar-qr-lote")
+@login_required
+def generar_qr_lote():
+    """Genera los QR de todos los formularios activos (o de `formularios=a,b`)
+    en un ZIP de PNG o en una hoja PDF lista para imprimir (`formato=pdf`)"""
+    from utils.qr import generar_lote_qr, zip_qr, hoja_qr_pdf
+
+    formato = request.args.get("formato", "zip")
+    if formato not in ("zip", "pdf"):
+        return jsonify({"success": False, "error": f"Formato no soportado: {formato}"}), 400
+
+    seleccion = {n.strip() for n in request.args.get("formularios", "").split(",") if n.strip()}
+    titulos = {}
+    for nombre, config in listar_formularios():
+        if seleccion and nombre not in seleccion:
+            continue
+        if not seleccion and not config.get("activo", True):
+            continue
+        titulos[nombre] = config.get("titulo", nombre)
+
+    if not titulos:
+        return jsonify({"success": False, "error": "No hay formularios para generar"}), 404
+
+    base_url = request.host_url.rstrip('/')
+    urls = {nombre: f"{base_url}/formulario/{nombre}" for nombre in sorted(titulos)}
+    imagenes = generar_lote_qr(urls)
+
+    if formato == "pdf":
+        pdf = hoja_qr_pdf([(titulos[nombre], png) for nombre, png in imagenes])
+        return send_file(BytesIO(pdf), mimetype='application/pdf', download_name='qr_formularios.pdf')
+
+    return Response(
+        zip_qr(imagenes),
+        mimetype="application/zip",
+        headers={"Content-Disposition": "attachment; filename=qr_formularios.zip"},
+    )
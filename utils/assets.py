@@ -0,0 +1,283 @@
+import os
+import re
+import gzip
+import json
+import hashlib
+import mimetypes
+
+from flask import abort, request, send_from_directory, url_for
+
+from utils.bloqueos import bloqueo_archivo
+from utils.metricas import logger
+
+try:
+    import brotli
+except ImportError:  # Opcional: sin brotli solo se genera .gz
+    brotli = None
+
+# Pipeline de archivos estáticos: el CSS de Tailwind se reduce a las clases
+# que aparecen en templates/, se precomprime (gzip y brotli) y se publica con
+# el hash del contenido en el nombre (static/dist/), servido en /assets/ con
+# caché inmutable. El manifiesto guarda el hash de las fuentes: si cambian el
+# CSS o los templates, se reconstruye al arrancar (o con `flask assets`).
+
+CARPETA_DIST = "dist"
+MANIFIESTO = "manifest.json"
+# Cambiar al modificar el pipeline para forzar una reconstrucción
+VERSION_PIPELINE = "1"
+
+# Archivos a publicar: ruta dentro de static/ -> se purga como CSS
+ARCHIVOS = {
+    "css/tailwind.min.css": True,
+    "images/form4.png": False,
+    "images/icon.ico": False,
+}
+EXTENSIONES_COMPRIMIBLES = (".css", ".js", ".svg")
+CACHE_INMUTABLE = "public, max-age=31536000, immutable"
+
+# Palabras de los templates (posibles clases); se separan por espacios,
+# comillas y signos de HTML, así `class="a {{ 'b' if x }}"` da a y b
+RE_PALABRA = re.compile(r"[^\s\"'`<>=]+")
+RE_CLASE = re.compile(r"\.((?:\\[0-9a-fA-F]{1,6} ?|\\.|[\w-])+)")
+RE_ESCAPE = re.compile(r"\\([0-9a-fA-F]{1,6}) ?|\\(.)")
+
+
+# -------------------
+# Purga del CSS
+# -------------------
+def _desescapar(nombre):
+    return RE_ESCAPE.sub(lambda m: chr(int(m.group(1), 16)) if m.group(1) else m.group(2), nombre)
+
+
+def clases_usadas(carpeta_templates):
+    """Conjunto de palabras que aparecen en los templates"""
+    usadas = set()
+    for raiz, _, archivos in os.walk(carpeta_templates):
+        for archivo in archivos:
+            if archivo.endswith(".html"):
+                with open(os.path.join(raiz, archivo), "r", encoding="utf-8") as f:
+                    usadas.update(RE_PALABRA.findall(f.read()))
+    return usadas
+
+
+def _bloques(css):
+    """Dividir CSS en (prelude, cuerpo) de primer nivel respetando llaves y comillas"""
+    i, n = 0, len(css)
+    while i < n:
+        if css.startswith("/*", i):
+            fin = css.find("*/", i + 2)
+            i = n if fin < 0 else fin + 2
+            continue
+        inicio = i
+        while i < n and css[i] not in "{;":
+            i += 1
+        if i >= n:
+            return
+        prelude = css[inicio:i].strip()
+        if css[i] == ";":  # @import/@charset
+            i += 1
+            if prelude:
+                yield prelude, None
+            continue
+
+        profundidad, comilla, cuerpo_inicio = 0, None, i + 1
+        while i < n:
+            c = css[i]
+            if comilla:
+                if c == "\\":
+                    i += 1
+                elif c == comilla:
+                    comilla = None
+            elif c in "\"'":
+                comilla = c
+            elif c == "{":
+                profundidad += 1
+            elif c == "}":
+                profundidad -= 1
+                if profundidad == 0:
+                    break
+            i += 1
+        yield prelude, css[cuerpo_inicio:i]
+        i += 1
+
+
+def _dividir_selectores(prelude):
+    """Separar por comas de primer nivel (no las de :not(...))"""
+    partes, nivel, actual = [], 0, []
+    for c in prelude:
+        if c == "(":
+            nivel += 1
+        elif c == ")":
+            nivel -= 1
+        elif c == "," and nivel == 0:
+            partes.append("".join(actual))
+            actual = []
+            continue
+        actual.append(c)
+    partes.append("".join(actual))
+    return partes
+
+
+def purgar_css(css, usadas):
+    """CSS con solo las reglas cuyas clases están todas en `usadas`.
+
+    Las reglas sin clases (base, variables, elementos) se conservan siempre.
+    """
+    salida = []
+    for prelude, cuerpo in _bloques(css):
+        if cuerpo is None:
+            salida.append(prelude + ";")
+        elif prelude.startswith("@media") or prelude.startswith("@supports"):
+            interno = purgar_css(cuerpo, usadas)
+            if interno:
+                salida.append(f"{prelude}{{{interno}}}")
+        elif prelude.startswith("@"):
+            salida.append(f"{prelude}{{{cuerpo}}}")  # @keyframes, @font-face, ...
+        else:
+            selectores = [
+                s for s in _dividir_selectores(prelude)
+                if all(_desescapar(c) in usadas for c in RE_CLASE.findall(s))
+            ]
+            if selectores:
+                salida.append(f"{','.join(selectores)}{{{cuerpo}}}")
+    return "".join(salida)
+
+
+# -------------------
+# Construcción y manifiesto
+# -------------------
+def _huella_fuentes(static_dir, carpeta_templates):
+    """Hash de todo lo que determina el resultado (archivos fuente y templates)"""
+    h = hashlib.sha256(VERSION_PIPELINE.encode())
+    rutas = [(r, os.path.join(static_dir, r)) for r in sorted(ARCHIVOS)]
+    for raiz, _, archivos in sorted(os.walk(carpeta_templates)):
+        rutas.extend((os.path.relpath(os.path.join(raiz, a), carpeta_templates), os.path.join(raiz, a))
+                     for a in sorted(archivos) if a.endswith(".html"))
+    # Rutas relativas: la huella no depende de dónde está instalada la app
+    for nombre, ruta in rutas:
+        h.update(nombre.replace(os.sep, "/").encode())
+        with open(ruta, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def _escribir(ruta, contenido):
+    tmp_path = f"{ruta}.tmp.{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(contenido)
+    os.replace(tmp_path, ruta)
+
+
+def construir(static_dir, carpeta_templates):
+    """Generar static/dist/ y su manifiesto. Devuelve el manifiesto"""
+    dist = os.path.join(static_dir, CARPETA_DIST)
+    os.makedirs(dist, exist_ok=True)
+    usadas = clases_usadas(carpeta_templates)
+
+    archivos = {}
+    for origen, es_css in ARCHIVOS.items():
+        with open(os.path.join(static_dir, origen), "rb") as f:
+            contenido = f.read()
+        if es_css:
+            contenido = purgar_css(contenido.decode("utf-8"), usadas).encode("utf-8")
+
+        base, extension = os.path.splitext(os.path.basename(origen))
+        destino = f"{base}.{hashlib.sha256(contenido).hexdigest()[:12]}{extension}"
+        _escribir(os.path.join(dist, destino), contenido)
+        if extension in EXTENSIONES_COMPRIMIBLES:
+            _escribir(os.path.join(dist, destino + ".gz"), gzip.compress(contenido, 9, mtime=0))
+            if brotli:
+                _escribir(os.path.join(dist, destino + ".br"), brotli.compress(contenido, quality=11))
+        archivos[origen] = destino
+
+    # Borrar versiones anteriores que ya no están en el manifiesto
+    vigentes = set(archivos.values()) | {MANIFIESTO, ".lock"}
+    for archivo in os.listdir(dist):
+        base = archivo[:-3] if archivo.endswith((".gz", ".br")) else archivo
+        if base not in vigentes:
+            os.remove(os.path.join(dist, archivo))
+
+    manifiesto = {"fuentes": _huella_fuentes(static_dir, carpeta_templates), "archivos": archivos}
+    _escribir(os.path.join(dist, MANIFIESTO), json.dumps(manifiesto, indent=2).encode("utf-8"))
+    return manifiesto
+
+
+def _leer_manifiesto(ruta):
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def cargar_manifiesto(static_dir, carpeta_templates):
+    """Manifiesto vigente; se reconstruye si las fuentes cambiaron.
+
+    Si no se puede escribir (sistema de archivos de solo lectura) se usa el
+    existente aunque esté viejo, o ninguno.
+    """
+    dist = os.path.join(static_dir, CARPETA_DIST)
+    manifiesto = _leer_manifiesto(os.path.join(dist, MANIFIESTO))
+    huella = _huella_fuentes(static_dir, carpeta_templates)
+    if manifiesto and manifiesto.get("fuentes") == huella:
+        return manifiesto
+
+    try:
+        os.makedirs(dist, exist_ok=True)
+        with bloqueo_archivo(os.path.join(dist, ".lock")):
+            # Otro worker pudo haberlo construido mientras esperábamos
+            actual = _leer_manifiesto(os.path.join(dist, MANIFIESTO))
+            if actual and actual.get("fuentes") == huella:
+                return actual
+            return construir(static_dir, carpeta_templates)
+    except OSError as e:
+        logger.warning("No se pudieron construir los assets (%s); se usa el manifiesto existente", e)
+        return manifiesto
+
+
+# -------------------
+# Integración con Flask
+# -------------------
+def init_assets(app):
+    """Registrar asset_url() en los templates, la ruta /assets/ y `flask assets`"""
+    static_dir = app.static_folder
+    carpeta_templates = os.path.join(app.root_path, app.template_folder)
+    dist = os.path.join(static_dir, CARPETA_DIST)
+    estado = {"archivos": (cargar_manifiesto(static_dir, carpeta_templates) or {}).get("archivos", {})}
+
+    def asset_url(filename):
+        """URL con hash del contenido, o la de static/ si no está publicado"""
+        destino = estado["archivos"].get(filename)
+        if destino is None:
+            return url_for("static", filename=filename)
+        return url_for("asset", nombre=destino)
+
+    app.jinja_env.globals["asset_url"] = asset_url
+
+    @app.route("/assets/<nombre>")
+    def asset(nombre):
+        if nombre not in estado["archivos"].values():
+            abort(404)
+
+        # Versión precomprimida según Accept-Encoding (brotli primero)
+        archivo, codificacion = nombre, None
+        for extension, nombre_codificacion in ((".br", "br"), (".gz", "gzip")):
+            if nombre_codificacion in request.accept_encodings and \
+                    os.path.exists(os.path.join(dist, nombre + extension)):
+                archivo, codificacion = nombre + extension, nombre_codificacion
+                break
+
+        tipo = mimetypes.guess_type(nombre)[0] or "application/octet-stream"
+        respuesta = send_from_directory(dist, archivo, mimetype=tipo, max_age=31536000)
+        if codificacion:
+            respuesta.headers["Content-Encoding"] = codificacion
+        respuesta.headers["Cache-Control"] = CACHE_INMUTABLE
+        respuesta.vary.add("Accept-Encoding")
+        return respuesta
+
+    @app.cli.command("assets")
+    def construir_assets():
+        """Reconstruir static/dist/ (CSS purgado, comprimido y con hash)"""
+        estado["archivos"] = construir(static_dir, carpeta_templates)["archivos"]
+        for origen, destino in estado["archivos"].items():
+            print(f"{origen} -> {CARPETA_DIST}/{destino}")
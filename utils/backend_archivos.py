@@ -0,0 +1,639 @@
+import os
+import csv
+import gzip
+import json
+import shutil
+import sqlite3
+from datetime import datetime
+
+from utils import estadisticas, indices, storage
+from utils.bloqueos import escribir_atomico
+from utils.claves import claves_formulario
+from utils.metricas import logger
+from utils.storage import bloqueo_formulario
+from utils.formularios import columnas_formulario
+from utils.lectura import registros_json
+
+# Backend "archivos": log de solo-anexar data/<form>.jsonl más data/<form>.csv.
+# Las posiciones (offset) que usan índices y estadísticas son bytes del log
+# y la "generación" es el inodo del archivo.
+#
+# El log activo se puede archivar en segmentos comprimidos (data/archivo/<form>/)
+# descritos por un manifiesto. Las posiciones cuentan entonces los bytes (sin
+# comprimir) de los segmentos más los del log activo, y la generación pasa a
+# ser la del manifiesto: archivar no invalida índices, espejos ni estadísticas.
+
+PERMITE_ARCHIVAR = True
+# Tamaño del log activo (MB) a partir del cual se archiva solo; 0 = solo a mano.
+# Lo fija storage.configurar_backend (config ARCHIVAR_MB)
+ARCHIVAR_MB = 0
+
+def _ruta_log(form_name):
+    """Log de solo-anexar (JSON Lines): un registro por línea"""
+    return os.path.join(storage.DATA_DIR, f"{form_name}.jsonl")
+
+
+def _ruta_json(form_name):
+    """Archivo JSON heredado (arreglo completo de registros)"""
+    return os.path.join(storage.DATA_DIR, f"{form_name}.json")
+
+
+def _ruta_csv(form_name):
+    return os.path.join(storage.DATA_DIR, f"{form_name}.csv")
+
+
+def _ruta_pendiente(form_name):
+    """Intención de escritura: tamaños de JSONL y CSV antes de anexar"""
+    return os.path.join(storage.DATA_DIR, f"{form_name}.pendiente")
+
+
+# -------------------
+# Segmentos archivados
+# -------------------
+def _carpeta_archivo(form_name):
+    """Segmentos: data/archivo/<form>/<form>-AAAAMMDD-HHMMSS.jsonl.gz y manifest.json"""
+    return os.path.join(storage.DATA_DIR, "archivo", form_name)
+
+
+def _ruta_manifiesto(form_name):
+    return os.path.join(_carpeta_archivo(form_name), "manifest.json")
+
+
+def _leer_manifiesto(form_name):
+    """Manifiesto de segmentos, o None si el formulario nunca se archivó.
+
+    {"generacion": int, "log": inodo del log activo, "bytes": total sin comprimir,
+     "seq": último `_seq` archivado,
+     "segmentos": [{"archivo", "bytes", "registros", "desde", "hasta", "creado"}]}
+    """
+    try:
+        with open(_ruta_manifiesto(form_name), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _guardar_manifiesto(form_name, manifiesto):
+    os.makedirs(_carpeta_archivo(form_name), exist_ok=True)
+    escribir_atomico(_ruta_manifiesto(form_name), json.dumps(manifiesto, ensure_ascii=False, indent=2))
+
+
+def _inodo(ruta):
+    try:
+        return os.stat(ruta).st_ino
+    except FileNotFoundError:
+        return None
+
+
+def _ruta_log_activo(form_name, manifiesto):
+    """Log activo según el manifiesto.
+
+    Si un reemplazo del log quedó a medias (caída entre el manifiesto y el
+    rename) el activo es todavía el `.tmp`; None si no se encuentra.
+    """
+    ruta = _ruta_log(form_name)
+    if manifiesto is None or _inodo(ruta) == manifiesto["log"]:
+        return ruta
+    tmp_path = f"{ruta}.tmp"
+    return tmp_path if _inodo(tmp_path) == manifiesto["log"] else None
+
+
+def _reemplazar_log(form_name, tmp_path, nueva_generacion):
+    """Reemplazar el log activo por `tmp_path`, actualizando antes el manifiesto"""
+    manifiesto = _leer_manifiesto(form_name)
+    if manifiesto is not None:
+        inodo = os.stat(tmp_path).st_ino
+        manifiesto["log"] = inodo
+        if nueva_generacion:
+            manifiesto["generacion"] = inodo
+        _guardar_manifiesto(form_name, manifiesto)
+    os.replace(tmp_path, _ruta_log(form_name))
+
+
+def _completar_reemplazo(form_name):
+    """Terminar un reemplazo del log interrumpido (con el bloqueo tomado)"""
+    manifiesto = _leer_manifiesto(form_name)
+    ruta_log = _ruta_log(form_name)
+    if manifiesto is None or _inodo(ruta_log) == manifiesto["log"]:
+        return
+
+    tmp_path = f"{ruta_log}.tmp"
+    if _inodo(tmp_path) == manifiesto["log"]:
+        os.replace(tmp_path, ruta_log)
+    else:
+        # El log se cambió por fuera de la app: adoptarlo como una generación nueva
+        if not os.path.exists(ruta_log):
+            open(ruta_log, "wb").close()
+        manifiesto["log"] = manifiesto["generacion"] = _inodo(ruta_log)
+        _guardar_manifiesto(form_name, manifiesto)
+
+
+def _archivar(form_name):
+    """Sellar el log activo en un segmento comprimido (con el bloqueo tomado).
+
+    Devuelve la entrada del segmento en el manifiesto, o None si no había
+    registros que archivar.
+    """
+    _completar_reemplazo(form_name)
+    _recuperar_escritura(form_name)
+    ruta_log = _ruta_log(form_name)
+    if not _tamaño(ruta_log):
+        return None
+
+    manifiesto = _leer_manifiesto(form_name)
+    # El log activo queda vacío: el último `_seq` se recuerda en el manifiesto
+    seq = _ultimo_seq(form_name, manifiesto)
+    manifiesto = manifiesto or {
+        "generacion": _inodo(ruta_log), "log": None, "bytes": 0, "segmentos": [],
+    }
+    manifiesto["seq"] = seq
+    carpeta = _carpeta_archivo(form_name)
+    os.makedirs(carpeta, exist_ok=True)
+    creado = datetime.now()
+    nombre = f"{form_name}-{creado:%Y%m%d-%H%M%S}.jsonl.gz"
+    if os.path.exists(os.path.join(carpeta, nombre)):
+        nombre = f"{form_name}-{creado:%Y%m%d-%H%M%S-%f}.jsonl.gz"
+
+    # Solo líneas completas: una última línea a medias no es un registro
+    ruta_segmento = os.path.join(carpeta, nombre)
+    tmp_segmento = f"{ruta_segmento}.tmp"
+    sellados, registros, fechas = 0, 0, []
+    with open(ruta_log, "rb") as origen, open(tmp_segmento, "wb") as destino:
+        with gzip.GzipFile(fileobj=destino, mode="wb", mtime=0) as comprimido:
+            for linea in origen:
+                if not linea.endswith(b"\n"):
+                    break
+                comprimido.write(linea)
+                sellados += len(linea)
+                if linea.strip():
+                    registros += 1
+                    try:
+                        fecha = json.loads(linea).get("_fecha")
+                    except (json.JSONDecodeError, AttributeError):
+                        fecha = None
+                    if fecha:
+                        fechas.append(fecha)
+        destino.flush()
+        os.fsync(destino.fileno())
+    os.replace(tmp_segmento, ruta_segmento)
+
+    segmento = {
+        "archivo": nombre,
+        "bytes": sellados,
+        "registros": registros,
+        "desde": min(fechas) if fechas else None,
+        "hasta": max(fechas) if fechas else None,
+        "creado": creado.isoformat(timespec="seconds"),
+    }
+    manifiesto["segmentos"].append(segmento)
+    manifiesto["bytes"] += sellados
+
+    # Log activo nuevo y vacío; el manifiesto se confirma antes del rename
+    tmp_log = f"{ruta_log}.tmp"
+    open(tmp_log, "wb").close()
+    manifiesto["log"] = _inodo(tmp_log)
+    _guardar_manifiesto(form_name, manifiesto)
+    os.replace(tmp_log, ruta_log)
+
+    # El CSV guardado solo reflejaba el log activo: la descarga se arma desde los segmentos
+    if os.path.exists(_ruta_csv(form_name)):
+        os.remove(_ruta_csv(form_name))
+    return segmento
+
+
+def archivar_registros(form_name):
+    """Archivar los registros del log activo en un segmento `.jsonl.gz`"""
+    migrar_registros(form_name)
+    with bloqueo_formulario(form_name):
+        return _archivar(form_name)
+
+
+def segmentos_archivados(form_name):
+    """Segmentos del formulario (entradas del manifiesto), del más viejo al más nuevo"""
+    manifiesto = _leer_manifiesto(form_name)
+    return manifiesto["segmentos"] if manifiesto else []
+
+
+def migrar_registros(form_name):
+    """Convertir una sola vez el JSON heredado al log JSON Lines.
+
+    El archivo original se conserva como `<form>.json.migrado`.
+    """
+    ruta_json = _ruta_json(form_name)
+    if not os.path.exists(ruta_json):
+        return
+
+    with bloqueo_formulario(form_name):
+        # Otro worker pudo haber migrado mientras esperábamos el bloqueo
+        if os.path.exists(ruta_json):
+            _migrar(form_name, ruta_json)
+
+
+def _migrar(form_name, ruta_json):
+    # Los registros heredados van primero; si ya había log se conservan detrás.
+    # El arreglo se lee de a un registro: un archivo grande no se carga entero
+    ruta_log = _ruta_log(form_name)
+    tmp_path = f"{ruta_log}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for reg in registros_json(ruta_json):
+            f.write(json.dumps(reg, ensure_ascii=False) + "\n")
+        for reg in _leer_log(ruta_log):
+            f.write(json.dumps(reg, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    _reemplazar_log(form_name, tmp_path, nueva_generacion=True)
+    storage.renombrar_migrado(ruta_json)
+
+
+def migrar_todos():
+    """Migrar todos los `data/*.json` heredados"""
+    if not os.path.exists(storage.DATA_DIR):
+        return
+    for archivo in os.listdir(storage.DATA_DIR):
+        if archivo.endswith(".json") and not archivo.endswith(".stats.json"):
+            migrar_registros(os.path.splitext(archivo)[0])
+
+
+def _leer_log(ruta, corruptas=None, abrir=open):
+    """Iterar los registros de un log JSON Lines (`abrir=gzip.open` para segmentos).
+
+    Una última línea sin salto de línea es una escritura en curso y se ignora.
+    Las líneas dañadas se saltan y se cuentan en `corruptas` (lista) si se pasa.
+    """
+    if not ruta or not os.path.exists(ruta):
+        return
+
+    with abrir(ruta, "rt", encoding="utf-8") as f:
+        for linea in f:
+            if not linea.endswith("\n"):
+                break
+            if not linea.strip():
+                continue
+            try:
+                yield json.loads(linea)
+            except json.JSONDecodeError:
+                if corruptas is not None:
+                    corruptas.append(linea)
+
+
+def _iterar(form_name, corruptas=None):
+    """Registros de los segmentos archivados y después los del log activo"""
+    manifiesto = _leer_manifiesto(form_name)
+    for segmento in manifiesto["segmentos"] if manifiesto else ():
+        yield from _leer_log(os.path.join(_carpeta_archivo(form_name), segmento["archivo"]), abrir=gzip.open)
+    yield from _leer_log(_ruta_log_activo(form_name, manifiesto), corruptas)
+
+
+def iterar_registros(form_name):
+    """Iterar los registros de un formulario sin cargarlos todos en memoria"""
+    migrar_registros(form_name)
+    yield from _iterar(form_name)
+
+
+def compactar_registros(form_name):
+    """Reescribir el log activo descartando líneas dañadas (escrituras interrumpidas)"""
+    ruta_log = _ruta_log(form_name)
+    if not os.path.exists(ruta_log):
+        return
+
+    with bloqueo_formulario(form_name):
+        _completar_reemplazo(form_name)
+        tmp_path = f"{ruta_log}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for reg in _leer_log(ruta_log):
+                f.write(json.dumps(reg, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        _reemplazar_log(form_name, tmp_path, nueva_generacion=True)
+
+
+def cargar_registros(form_name):
+    """Cargar registros existentes"""
+    migrar_registros(form_name)
+
+    corruptas = []
+    registros = list(_iterar(form_name, corruptas))
+    if corruptas:
+        compactar_registros(form_name)
+    return registros
+
+
+def estado_log(form_name):
+    """(inodo, tamaño) del log; el inodo cambia cuando el log se reemplaza.
+
+    Con segmentos archivados: (generación del manifiesto, bytes archivados
+    más el tamaño del log activo).
+    """
+    manifiesto = _leer_manifiesto(form_name)
+    ruta = _ruta_log_activo(form_name, manifiesto)
+    try:
+        stat = os.stat(ruta) if ruta else None
+    except FileNotFoundError:
+        stat = None
+
+    if manifiesto is None:
+        return (stat.st_ino, stat.st_size) if stat else (None, 0)
+    return manifiesto["generacion"], manifiesto["bytes"] + (stat.st_size if stat else 0)
+
+
+def _leer_lineas(f, offset):
+    """Iterar (registro, offset_siguiente) de un archivo binario desde `offset`"""
+    f.seek(offset)
+    for linea in f:
+        if not linea.endswith(b"\n"):
+            break
+        offset += len(linea)
+        try:
+            reg = json.loads(linea)
+        except json.JSONDecodeError:
+            reg = None
+        yield reg, offset
+
+
+def leer_log_desde(form_name, offset):
+    """Iterar (registro, offset_siguiente) a partir de un byte del log.
+
+    Sirve para mantener estructuras derivadas (índices, espejos) al día
+    leyendo solo lo que se anexó desde la última vez. Recorre primero los
+    segmentos archivados que queden después de `offset`.
+    """
+    manifiesto = _leer_manifiesto(form_name)
+    base = 0
+    for segmento in manifiesto["segmentos"] if manifiesto else ():
+        fin = base + segmento["bytes"]
+        if offset < fin:
+            with gzip.open(os.path.join(_carpeta_archivo(form_name), segmento["archivo"]), "rb") as f:
+                for reg, local in _leer_lineas(f, max(0, offset - base)):
+                    yield reg, base + local
+        base = fin
+
+    ruta = _ruta_log_activo(form_name, manifiesto)
+    if not ruta or not os.path.exists(ruta):
+        return
+
+    with open(ruta, "rb") as f:
+        for reg, local in _leer_lineas(f, max(0, offset - base)):
+            yield reg, base + local
+
+
+def invalidar_indices(form_name):
+    """Descartar los índices de claves únicas del formulario (se reconstruyen al consultar)"""
+    indices.eliminar_indices(form_name)
+
+
+def clave_existe(form_name, clave, valor):
+    """Validar si ya existe un registro con ese valor de la clave única (índice persistente)"""
+    migrar_registros(form_name)
+    return indices.existe(form_name, clave, valor)
+
+
+def _seq_final(ruta):
+    """`_seq` del último registro completo del log, o None si no se puede leer"""
+    with open(ruta, "rb") as f:
+        fin = f.seek(0, os.SEEK_END)
+        f.seek(max(0, fin - 64 * 1024))
+        lineas = f.read().split(b"\n")[:-1]  # Lo que sigue al último salto está a medias
+    for linea in reversed(lineas):
+        if linea.strip():
+            try:
+                seq = json.loads(linea).get("_seq")
+            except (json.JSONDecodeError, AttributeError):
+                return None
+            return seq if isinstance(seq, int) else None
+    return None
+
+
+def _ultimo_seq(form_name, manifiesto):
+    """Último número de secuencia asignado (con el bloqueo tomado).
+
+    Se lee del final del log activo (o del manifiesto si está vacío). Si hay
+    registros anteriores a `_seq`, se cuentan una vez en orden.
+    """
+    ruta_log = _ruta_log(form_name)
+    if _tamaño(ruta_log):
+        seq = _seq_final(ruta_log)
+        if seq is not None:
+            return seq
+    elif manifiesto is None:
+        return 0
+    elif "seq" in manifiesto:
+        return manifiesto["seq"]
+
+    ultimo = 0
+    for reg in _iterar(form_name):
+        seq = reg.get("_seq") if isinstance(reg, dict) else None
+        ultimo = max(ultimo, seq if isinstance(seq, int) else ultimo + 1)
+    return ultimo
+
+
+def _anexar_lineas(ruta, lineas):
+    """Anexar líneas al log en una sola escritura, cerrando antes una línea
+    previa incompleta.
+
+    Devuelve el rango de bytes (inicio, fin) que ocupan las líneas escritas.
+    """
+    with open(ruta, "a+b") as f:
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+        inicio = f.tell()
+        f.write("".join(lineas).encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+        return inicio, f.tell()
+
+
+def _recuperar_escritura(form_name):
+    """Deshacer una escritura interrumpida (caída del proceso entre JSONL y CSV).
+
+    Se trunca cada archivo al tamaño que tenía antes de anexar, de modo que
+    JSONL y CSV quedan siempre con los mismos registros.
+    """
+    ruta_pendiente = _ruta_pendiente(form_name)
+    if not os.path.exists(ruta_pendiente):
+        return
+
+    try:
+        with open(ruta_pendiente, "r", encoding="utf-8") as f:
+            tamaños = json.load(f)
+    except json.JSONDecodeError:
+        tamaños = None  # La caída fue antes de terminar la intención: nada se anexó
+
+    for ruta, tamaño in zip((_ruta_log(form_name), _ruta_csv(form_name)), tamaños or ()):
+        if not os.path.exists(ruta):
+            continue
+        if tamaño is None:
+            os.remove(ruta)
+        elif os.path.getsize(ruta) > tamaño:
+            os.truncate(ruta, tamaño)
+    os.remove(ruta_pendiente)
+
+
+def _tamaño(ruta):
+    return os.path.getsize(ruta) if os.path.exists(ruta) else None
+
+
+def _encabezado_csv(ruta):
+    """Columnas del CSV guardado (su primera fila) o None si no existe"""
+    try:
+        with open(ruta, "r", newline="", encoding="utf-8") as f:
+            return next(csv.reader(f), None)
+    except FileNotFoundError:
+        return None
+
+
+def _fila_csv(data):
+    """Fila para el CSV: listas separadas por | y sin metadatos internos"""
+    return {
+        k: "|".join(v) if isinstance(v, list) else v
+        for k, v in data.items()
+        if not k.startswith("_")
+    }
+
+
+def guardar_registros(form_name, registros):
+    """Guardar varios registros en JSON Lines y CSV con una sola escritura.
+
+    La escritura se serializa entre workers con un bloqueo por formulario
+    y JSONL y CSV se confirman juntos: si algo falla se deshacen ambos.
+    Lanza storage.RegistroDuplicado (sin guardar ninguno) si un registro
+    repite una clave única del formulario.
+    """
+    os.makedirs(storage.DATA_DIR, exist_ok=True)
+    migrar_registros(form_name)
+
+    filas_csv = [_fila_csv(data) for data in registros]
+
+    log_path = _ruta_log(form_name)
+    csv_path = _ruta_csv(form_name)
+    ruta_pendiente = _ruta_pendiente(form_name)
+    claves = claves_formulario(form_name)
+
+    with bloqueo_formulario(form_name):
+        _completar_reemplazo(form_name)
+        _recuperar_escritura(form_name)
+        try:
+            indices.verificar(form_name, claves, registros)
+        except sqlite3.Error:
+            logger.exception("No se pudieron verificar las claves únicas de %s", form_name)
+        manifiesto = _leer_manifiesto(form_name)
+        base = manifiesto["bytes"] if manifiesto else 0
+
+        # Número de secuencia creciente por registro (feed de cambios)
+        seq = _ultimo_seq(form_name, manifiesto)
+        for seq, data in enumerate(registros, start=seq + 1):
+            data["_seq"] = seq
+        lineas = [json.dumps(data, ensure_ascii=False) + "\n" for data in registros]
+
+        escribir_atomico(ruta_pendiente, json.dumps([_tamaño(log_path), _tamaño(csv_path)]))
+
+        try:
+            # -------------------
+            # Anexar al log JSON Lines (O(1) por registro)
+            # -------------------
+            inicio, fin = _anexar_lineas(log_path, lineas)
+
+            # -------------------
+            # Guardar en CSV
+            # -------------------
+            # Las filas siguen siempre el encabezado ya escrito: si el formulario
+            # cambió de campos, los nuevos no entran aquí (la descarga se arma
+            # desde el log con todas las columnas; ver archivo_descarga)
+            encabezado = _encabezado_csv(csv_path)
+            with open(csv_path, "a", newline="", encoding="utf-8") as csvfile:
+                writer = csv.DictWriter(csvfile, fieldnames=encabezado or list(filas_csv[0]),
+                                        restval="", extrasaction="ignore")
+                if not encabezado:
+                    writer.writeheader()
+                writer.writerows(filas_csv)
+                csvfile.flush()
+                os.fsync(csvfile.fileno())
+        except Exception:
+            _recuperar_escritura(form_name)
+            raise
+
+        os.remove(ruta_pendiente)
+        try:
+            indices.registrar(form_name, claves, registros, base + inicio, base + fin)
+        except sqlite3.Error:
+            pass  # El índice se pone al día en la próxima consulta
+        try:
+            estadisticas.registrar(form_name, registros, base + inicio, base + fin)
+        except (OSError, ValueError):
+            pass  # Los registros ya quedaron guardados; las estadísticas se ponen al día al consultarlas
+
+        # Rotación automática: el log activo se mantiene chico
+        if ARCHIVAR_MB and fin > ARCHIVAR_MB * 1024 * 1024:
+            _archivar(form_name)
+
+
+def eliminar_registros(form_name):
+    """Eliminar los datos de un formulario (log, CSV, segmentos, archivo heredado
+    y sus copias `.migrado`)"""
+    with bloqueo_formulario(form_name):
+        invalidar_indices(form_name)
+        rutas = (_ruta_log(form_name), f"{_ruta_log(form_name)}.tmp", _ruta_csv(form_name),
+                 _ruta_json(form_name), _ruta_pendiente(form_name),
+                 *storage.rutas_migradas(_ruta_json(form_name)), *storage.rutas_migradas(_ruta_log(form_name)))
+        for ruta in rutas:
+            if os.path.exists(ruta):
+                os.remove(ruta)
+        shutil.rmtree(_carpeta_archivo(form_name), ignore_errors=True)
+
+
+def existen_registros(form_name):
+    rutas = (_ruta_csv(form_name), _ruta_log(form_name), _ruta_json(form_name), _ruta_manifiesto(form_name))
+    return any(os.path.exists(r) for r in rutas)
+
+
+def listar_datos():
+    """Archivos CSV descargables, con su tamaño (incluye los segmentos archivados)"""
+    tamaños = {}
+    if os.path.exists(storage.DATA_DIR):
+        for archivo in os.listdir(storage.DATA_DIR):
+            if archivo.endswith(".csv"):
+                tamaños[os.path.splitext(archivo)[0]] = os.path.getsize(os.path.join(storage.DATA_DIR, archivo))
+
+    carpeta_archivo = os.path.join(storage.DATA_DIR, "archivo")
+    segmentos = {}
+    if os.path.isdir(carpeta_archivo):
+        for form_name in os.listdir(carpeta_archivo):
+            lista = segmentos_archivados(form_name)
+            if not lista:
+                continue
+            segmentos[form_name] = len(lista)
+            tamaños[form_name] = tamaños.get(form_name, 0) + sum(
+                _tamaño(os.path.join(_carpeta_archivo(form_name), s["archivo"])) or 0 for s in lista
+            )
+
+    archivos = []
+    for form_name, tamaño in sorted(tamaños.items()):
+        texto = f"{tamaño / 1024:.2f} KB"
+        if form_name in segmentos:
+            texto += f" ({segmentos[form_name]} archivados)"
+        archivos.append({"nombre": f"{form_name}.csv", "formulario": form_name, "tamaño": texto})
+    return archivos
+
+
+def archivo_descarga(nombre):
+    """Ruta del archivo de datos guardado (p. ej. `form.csv`) o None si no existe.
+
+    Un CSV al que le faltan columnas de alguna versión del formulario, o de un
+    formulario con segmentos archivados, también devuelve None: la descarga se
+    genera desde el log con todas las columnas y todos los registros.
+    """
+    ruta = os.path.join(storage.DATA_DIR, os.path.basename(nombre))
+    if not os.path.isfile(ruta):
+        return None
+    form_name, extension = os.path.splitext(os.path.basename(nombre))
+    if extension == ".csv":
+        if _leer_manifiesto(form_name):
+            return None  # El CSV guardado solo tiene el log activo
+        try:
+            columnas = columnas_formulario(form_name)
+        except json.JSONDecodeError:
+            columnas = []
+        if not set(columnas) <= set(_encabezado_csv(ruta) or ()):
+            return None
+    return ruta
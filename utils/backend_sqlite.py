@@ -0,0 +1,429 @@
+import os
+import re
+import gzip
+import shutil
+import json
+import hashlib
+import time
+import sqlite3
+import threading
+
+from utils import basedatos, estadisticas, storage
+from utils.storage import bloqueo_formulario
+from utils.claves import claves_formulario, valor_clave, describir
+from utils.lectura import registros_json
+
+# Backend "sqlite": una base data/registros.db en modo WAL con una tabla por
+# formulario (id autoincremental + registro JSON) y un índice único por cada
+# clave única del formulario (ver utils/claves.py). Las posiciones que usan
+# índices y estadísticas son ids y la "generación" es el momento en que se
+# creó la tabla. CSV/JSON no se guardan: se generan al descargar.
+
+# La tabla no se divide en segmentos: sin archivar_registros
+PERMITE_ARCHIVAR = False
+
+# Conexión por hilo (ver utils/basedatos.py)
+_local = threading.local()
+
+
+def _ruta_db():
+    return os.path.join(storage.DATA_DIR, "registros.db")
+
+
+def _crear_tablas(conn):
+    # Los índices de claves únicas son expresiones sobre esta función
+    conn.create_function("clave_unica", 2, _clave_unica, deterministic=True)
+    conn.create_function("huella_registro", 1, _huella_datos, deterministic=True)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS formularios (
+            nombre TEXT PRIMARY KEY,
+            generacion INTEGER NOT NULL,
+            identificador TEXT,
+            unico INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+
+def _conectar():
+    return basedatos.conectar(_local, _ruta_db(), timeout=30, preparar=_crear_tablas)
+
+
+def _clave_unica(clave, datos):
+    """Valor de una clave única en un registro JSON (NULL si no aplica)"""
+    try:
+        data = json.loads(datos)
+        return valor_clave(clave, data) if isinstance(data, dict) else None
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def _tabla(form_name):
+    return '"form_' + form_name.replace('"', '""') + '"'
+
+
+def _expresion(clave):
+    """Expresión SQL de la clave (la misma en índice y consultas)"""
+    return "clave_unica('" + clave.replace("'", "''") + "', datos)"
+
+
+def _registro(conn, form_name):
+    return conn.execute(
+        "SELECT generacion, identificador, unico FROM formularios WHERE nombre = ?", (form_name,)
+    ).fetchone()
+
+
+def _claves_configuradas(form_name):
+    """Claves únicas del formulario como se guardan en formularios.identificador"""
+    return json.dumps(claves_formulario(form_name), ensure_ascii=False)
+
+
+# -------------------
+# Creación de tablas e importación de datos heredados
+# -------------------
+def _carpeta_archivo(form_name):
+    """Segmentos archivados por el backend de archivos (data/archivo/<form>/)"""
+    return os.path.join(storage.DATA_DIR, "archivo", form_name)
+
+
+def _rutas_heredadas(form_name):
+    """data/<form>.json, data/<form>.jsonl y el manifiesto de segmentos archivados"""
+    return [os.path.join(storage.DATA_DIR, f"{form_name}{ext}") for ext in (".json", ".jsonl")] + [
+        os.path.join(_carpeta_archivo(form_name), "manifest.json")
+    ]
+
+
+def _leer_lineas(ruta, abrir=open):
+    """Registros de un archivo JSON Lines (`abrir=gzip.open` para segmentos)"""
+    with abrir(ruta, "rt", encoding="utf-8") as f:
+        for linea in f:
+            if not linea.endswith("\n"):
+                break
+            try:
+                yield json.loads(linea)
+            except json.JSONDecodeError:
+                continue
+
+
+def _leer_heredados(form_name):
+    """Registros de data/<form>.json (arreglo) y, del backend de archivos, los
+    segmentos archivados (en el orden del manifiesto) y data/<form>.jsonl.
+
+    Un segmento listado que falta lanza FileNotFoundError: la importación se
+    deshace en vez de perder sus registros.
+    """
+    ruta_json, ruta_log, ruta_manifiesto = _rutas_heredadas(form_name)
+    if os.path.exists(ruta_json):
+        yield from registros_json(ruta_json)
+    if os.path.exists(ruta_manifiesto):
+        with open(ruta_manifiesto, "r", encoding="utf-8") as f:
+            segmentos = json.load(f).get("segmentos", [])
+        for segmento in segmentos:
+            yield from _leer_lineas(os.path.join(_carpeta_archivo(form_name), segmento["archivo"]), gzip.open)
+    if os.path.exists(ruta_log):
+        yield from _leer_lineas(ruta_log)
+
+
+def _huella(reg):
+    """Identidad de un registro para no importarlo dos veces: su `_id`
+    (escritura diferida) o, si no tiene, su contenido sin `_seq`"""
+    if reg.get("_id"):
+        return "id:" + str(reg["_id"])
+    contenido = json.dumps({k: v for k, v in reg.items() if k != "_seq"}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+def _huella_datos(datos):
+    try:
+        reg = json.loads(datos)
+    except ValueError:
+        return None
+    return _huella(reg) if isinstance(reg, dict) else None
+
+
+def _crear_tabla(conn, form_name):
+    """Crear la tabla vacía del formulario (dentro de la transacción)"""
+    tabla = _tabla(form_name)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {tabla} (id INTEGER PRIMARY KEY AUTOINCREMENT, datos TEXT NOT NULL)")
+    conn.execute(
+        "INSERT OR REPLACE INTO formularios (nombre, generacion, identificador, unico) VALUES (?, ?, NULL, 0)",
+        (form_name, time.time_ns()),
+    )
+
+
+def _importar_heredados(conn, form_name):
+    """Anexar a la tabla los registros heredados que todavía no tiene (dentro de la transacción).
+
+    Sirve también si la tabla ya existía (p. ej. tras volver un tiempo al
+    backend de archivos): los registros ya importados se reconocen por su
+    huella. Los índices se quitan y `_preparar` los vuelve a crear, así un
+    heredado con una clave repetida no impide la importación.
+    """
+    tabla = _tabla(form_name)
+    _quitar_indices(conn, form_name)
+    conn.execute("UPDATE formularios SET identificador = NULL, unico = 0 WHERE nombre = ?", (form_name,))
+
+    # Huellas en una tabla temporal (en disco): la memoria no depende de la cantidad de registros
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS huellas (huella TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM temp.huellas")
+    conn.execute(f"INSERT OR IGNORE INTO temp.huellas SELECT huella_registro(datos) FROM {tabla}")
+    siguiente = conn.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {tabla}").fetchone()[0]
+    for reg in _leer_heredados(form_name):
+        if not isinstance(reg, dict):
+            continue
+        if not conn.execute("INSERT OR IGNORE INTO temp.huellas VALUES (?)", (_huella(reg),)).rowcount:
+            continue
+        reg["_seq"] = siguiente  # El id es el número de secuencia, como en guardar_registros
+        conn.execute(f"INSERT INTO {tabla} (id, datos) VALUES (?, ?)",
+                     (siguiente, json.dumps(reg, ensure_ascii=False)))
+        siguiente += 1
+    conn.execute("DELETE FROM temp.huellas")
+
+
+def _quitar_indices(conn, form_name):
+    """Eliminar los índices de claves únicas del formulario"""
+    prefijo = "idx_" + form_name + "_"
+    for (nombre,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND substr(name, 1, ?) = ?",
+        (_tabla(form_name).strip('"').replace('""', '"'), len(prefijo), prefijo),
+    ).fetchall():
+        conn.execute('DROP INDEX "' + nombre.replace('"', '""') + '"')
+
+
+def _indexar(conn, form_name, claves):
+    """(Re)crear un índice por clave única (`claves`: lista en JSON).
+
+    Si los datos existentes ya repiten una clave, su índice queda sin UNIQUE
+    (la verificación de la app sigue funcionando, solo que sin garantía).
+    `unico` queda en 1 solo si todas las claves tienen índice UNIQUE.
+    """
+    tabla = _tabla(form_name)
+    prefijo = "idx_" + form_name + "_"
+    _quitar_indices(conn, form_name)
+    unico = 1
+    for numero, clave in enumerate(json.loads(claves)):
+        nombre_indice = '"' + (prefijo + f"clave{numero}").replace('"', '""') + '"'
+        try:
+            conn.execute(f"CREATE UNIQUE INDEX {nombre_indice} ON {tabla} ({_expresion(clave)})")
+        except sqlite3.IntegrityError:
+            conn.execute(f"CREATE INDEX {nombre_indice} ON {tabla} ({_expresion(clave)})")
+            unico = 0
+    conn.execute(
+        "UPDATE formularios SET identificador = ?, unico = ? WHERE nombre = ?",
+        (claves, unico, form_name),
+    )
+
+
+def _preparar(conn, form_name):
+    """Asegurar tabla e índice al día con la definición del formulario (con la transacción abierta)"""
+    registro = _registro(conn, form_name)
+    if registro is None:
+        _crear_tabla(conn, form_name)
+        registro = _registro(conn, form_name)
+    claves = _claves_configuradas(form_name)
+    if registro[1] != claves:
+        _indexar(conn, form_name, claves)
+
+
+def migrar_registros(form_name):
+    """Importar data/<form>.json / .jsonl y los segmentos archivados a la base,
+    aunque la tabla ya exista.
+
+    Los archivos importados se conservan como `.migrado` (sin pisar uno
+    anterior); de los segmentos se renombra el manifiesto y quedan en su carpeta.
+    """
+    if not any(os.path.exists(r) for r in _rutas_heredadas(form_name)):
+        return
+
+    conn = _conectar()
+    with bloqueo_formulario(form_name):
+        # Otro worker pudo haber importado mientras esperábamos el bloqueo
+        rutas = [r for r in _rutas_heredadas(form_name) if os.path.exists(r)]
+        if not rutas:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if _registro(conn, form_name) is None:
+                _crear_tabla(conn, form_name)
+            _importar_heredados(conn, form_name)
+            _preparar(conn, form_name)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        # Solo se renombra lo que se importó; si la caída es antes, la
+        # próxima importación reconoce los registros por su huella
+        for ruta in rutas:
+            storage.renombrar_migrado(ruta)
+
+
+def migrar_todos():
+    """Importar todos los `data/*.json` y `data/*.jsonl` heredados y los
+    segmentos archivados de data/archivo/"""
+    if not os.path.exists(storage.DATA_DIR):
+        return
+    for archivo in os.listdir(storage.DATA_DIR):
+        nombre, extension = os.path.splitext(archivo)
+        if extension in (".json", ".jsonl") and not archivo.endswith(".stats.json"):
+            migrar_registros(nombre)
+    carpeta_archivo = os.path.join(storage.DATA_DIR, "archivo")
+    if os.path.isdir(carpeta_archivo):
+        for nombre in os.listdir(carpeta_archivo):
+            migrar_registros(nombre)
+
+
+# -------------------
+# Lectura
+# -------------------
+def estado_log(form_name):
+    """(generación, último id) de la tabla del formulario"""
+    conn = _conectar()
+    registro = _registro(conn, form_name)
+    if registro is None:
+        return None, 0
+    fila = conn.execute(f"SELECT MAX(id) FROM {_tabla(form_name)}").fetchone()
+    return registro[0], fila[0] or 0
+
+
+def leer_log_desde(form_name, posicion):
+    """Iterar (registro, id) de los registros con id mayor que `posicion`"""
+    conn = _conectar()
+    if _registro(conn, form_name) is None:
+        return
+    cursor = conn.execute(f"SELECT id, datos FROM {_tabla(form_name)} WHERE id > ? ORDER BY id", (posicion,))
+    for id_registro, datos in cursor:
+        try:
+            reg = json.loads(datos)
+        except json.JSONDecodeError:
+            reg = None
+        yield reg, id_registro
+
+
+def iterar_registros(form_name):
+    """Iterar los registros de un formulario sin cargarlos todos en memoria"""
+    migrar_registros(form_name)
+    for reg, _ in leer_log_desde(form_name, 0):
+        if reg is not None:
+            yield reg
+
+
+def cargar_registros(form_name):
+    """Cargar registros existentes"""
+    return list(iterar_registros(form_name))
+
+
+def clave_existe(form_name, clave, valor):
+    """Validar si ya existe un registro con ese valor de la clave única (usa su índice)"""
+    migrar_registros(form_name)
+    conn = _conectar()
+    if _registro(conn, form_name) is None:
+        return False
+    fila = conn.execute(
+        f"SELECT 1 FROM {_tabla(form_name)} WHERE {_expresion(clave)} = ? LIMIT 1", (valor,)
+    ).fetchone()
+    return fila is not None
+
+
+def invalidar_indices(form_name):
+    """Sin índices en memoria: los mantiene SQLite"""
+
+
+# -------------------
+# Escritura
+# -------------------
+def _mensaje_duplicado(form_name, error, data):
+    """Mensaje de la clave que rechazó `data` (el índice violado se llama ..._clave<n>)"""
+    numero = re.search(r"_clave(\d+)", str(error))
+    claves = claves_formulario(form_name)
+    if numero is None or int(numero.group(1)) >= len(claves):
+        return str(error)
+    return f"Ya existe un registro con {describir(claves[int(numero.group(1))], data)}"
+
+
+def guardar_registros(form_name, registros):
+    """Guardar varios registros en una sola transacción.
+
+    Los índices únicos rechazan claves repetidas aunque lleguen a la vez
+    desde varios workers: se lanza storage.RegistroDuplicado y no se guarda
+    ninguno. El bloqueo del formulario mantiene el orden de las estadísticas.
+    """
+    migrar_registros(form_name)
+    conn = _conectar()
+    tabla = _tabla(form_name)
+
+    with bloqueo_formulario(form_name):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            _preparar(conn, form_name)
+            inicio = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {tabla}").fetchone()[0]
+            fin = inicio
+            # El id es también el número de secuencia del registro (feed de cambios)
+            for fin, data in enumerate(registros, start=inicio + 1):
+                data["_seq"] = fin
+                conn.execute(
+                    f"INSERT INTO {tabla} (id, datos) VALUES (?, ?)", (fin, json.dumps(data, ensure_ascii=False))
+                )
+            conn.execute("COMMIT")
+        except sqlite3.IntegrityError as e:
+            conn.execute("ROLLBACK")
+            raise storage.RegistroDuplicado(_mensaje_duplicado(form_name, e, data)) from e
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        try:
+            estadisticas.registrar(form_name, registros, inicio, fin)
+        except (OSError, ValueError):
+            pass  # Los registros ya quedaron guardados; las estadísticas se ponen al día al consultarlas
+
+
+def _rutas_archivos(form_name):
+    """Archivos que el backend de archivos pudo dejar para el formulario (CSV,
+    log, intención de escritura, heredados y sus copias `.migrado`)"""
+    ruta_json, ruta_log, _ = _rutas_heredadas(form_name)
+    base = os.path.join(storage.DATA_DIR, form_name)
+    return [ruta_json, ruta_log, f"{ruta_log}.tmp", f"{base}.csv", f"{base}.pendiente",
+            *storage.rutas_migradas(ruta_json), *storage.rutas_migradas(ruta_log)]
+
+
+def eliminar_registros(form_name):
+    """Eliminar la tabla del formulario y los archivos que quedaron del backend
+    de archivos (heredados, CSV, `.migrado` y segmentos archivados)"""
+    conn = _conectar()
+    with bloqueo_formulario(form_name):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(f"DROP TABLE IF EXISTS {_tabla(form_name)}")
+            conn.execute("DELETE FROM formularios WHERE nombre = ?", (form_name,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        for ruta in _rutas_archivos(form_name):
+            if os.path.exists(ruta):
+                os.remove(ruta)
+        shutil.rmtree(os.path.join(storage.DATA_DIR, "archivo", form_name), ignore_errors=True)
+
+
+def existen_registros(form_name):
+    return _registro(_conectar(), form_name) is not None or any(
+        os.path.exists(r) for r in _rutas_heredadas(form_name)
+    )
+
+
+def listar_datos():
+    """Formularios con datos; el CSV se genera al descargar"""
+    conn = _conectar()
+    archivos = []
+    for (nombre,) in conn.execute("SELECT nombre FROM formularios ORDER BY nombre").fetchall():
+        total = conn.execute(f"SELECT COUNT(*) FROM {_tabla(nombre)}").fetchone()[0]
+        archivos.append({
+            "nombre": f"{nombre}.csv",
+            "formulario": nombre,
+            "tamaño": f"{total} registros",
+        })
+    return archivos
+
+
+def archivo_descarga(nombre):
+    """No hay archivos guardados: la descarga se genera a partir de la tabla"""
+    return None
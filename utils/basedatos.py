@@ -0,0 +1,24 @@
+import os
+import sqlite3
+
+# Conexiones SQLite compartidas por limites, sesiones y el backend sqlite:
+# una por hilo (y por proceso: los workers de gunicorn hacen fork), en modo
+# WAL y en autocommit (cada módulo abre sus transacciones con BEGIN IMMEDIATE).
+
+
+def conectar(local, ruta, timeout=5, synchronous="NORMAL", preparar=None):
+    """Conexión en caché en `local` (un threading.local del módulo) para `ruta`.
+
+    Se reabre si cambia el proceso o la ruta. `preparar(conn)` crea el esquema
+    (y registra funciones) al abrirla.
+    """
+    clave = (os.getpid(), ruta)
+    if getattr(local, "clave", None) != clave:
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        conn = sqlite3.connect(ruta, timeout=timeout, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={synchronous}")
+        if preparar:
+            preparar(conn)
+        local.conn, local.clave = conn, clave
+    return local.conn
@@ -0,0 +1,56 @@
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def bloqueo_archivo(ruta):
+    """Bloqueo exclusivo entre procesos (workers de gunicorn) y entre hilos.
+
+    Se bloquea un archivo auxiliar `ruta`; el bloqueo se libera al salir del bloque.
+    """
+    with open(ruta, "a+b") as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def bloquear_sin_esperar(f):
+    """Tomar un bloqueo exclusivo sobre el archivo abierto `f` sin esperar.
+
+    Devuelve False si otro proceso ya lo tiene. El bloqueo dura hasta cerrar `f`.
+    """
+    try:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def escribir_atomico(ruta, contenido):
+    """Escribir un archivo completo con archivo temporal + rename atómico"""
+    tmp_path = f"{ruta}.tmp.{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(contenido)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, ruta)
@@ -0,0 +1,97 @@
+import time
+
+from utils import storage
+
+# Feed de cambios por formulario para sincronizar consumidores externos sin
+# descargar todo de nuevo. Cada registro lleva su número de secuencia (`_seq`)
+# y cada lectura devuelve un cursor opaco "<generación>:<posición>" (la misma
+# posición que usan estadísticas, índices y espejos) desde el que seguir. Si
+# los datos se reemplazan (compactación, borrado) la generación cambia: el
+# feed vuelve a empezar desde el principio y lo indica con `reiniciado` (el
+# consumidor descarta lo sincronizado). Los registros guardados antes de que
+# existiera `_seq` no lo tienen; los nuevos se numeran a continuación.
+
+# Registros por lectura (por defecto y máximo)
+LIMITE = 500
+LIMITE_MAXIMO = 5000
+# Segundos entre consultas mientras se espera un registro nuevo
+INTERVALO_ESPERA = 0.25
+# Cursor especial: solo lo que llegue a partir de ahora
+CURSOR_FIN = "fin"
+
+
+class CursorInvalido(ValueError):
+    """El cursor no tiene el formato "<generación>:<posición>" """
+
+
+def codificar_cursor(generacion, posicion):
+    return f"{'' if generacion is None else generacion}:{posicion}"
+
+
+def decodificar_cursor(cursor):
+    """(generación, posición) de un cursor; lanza CursorInvalido"""
+    generacion, separador, posicion = (cursor or "").rpartition(":")
+    if not separador or not posicion.isdigit() or (generacion and not generacion.isdigit()):
+        raise CursorInvalido(f"Cursor inválido: {cursor}")
+    return (int(generacion) if generacion else None), int(posicion)
+
+
+def cursor_actual(form_name):
+    """Cursor al final de los datos del formulario"""
+    storage.migrar_registros(form_name)
+    return codificar_cursor(*storage.estado_log(form_name))
+
+
+def _leer(form_name, cursor, limite, estado):
+    generacion, final = estado
+    posicion, reiniciado = 0, False
+    if cursor:
+        generacion_cursor, posicion = decodificar_cursor(cursor)
+        # Datos reemplazados desde que se leyó el cursor: empezar de nuevo
+        if posicion and (generacion_cursor != generacion or posicion > final):
+            posicion, reiniciado = 0, True
+
+    cambios = []
+    for reg, siguiente in storage.leer_log_desde(form_name, posicion):
+        posicion = siguiente
+        if reg is not None:
+            cambios.append((reg, codificar_cursor(generacion, posicion)))
+            if len(cambios) == limite:
+                break
+    return {
+        "cambios": cambios,
+        "cursor": codificar_cursor(generacion, posicion),
+        "reiniciado": reiniciado,
+        "mas": len(cambios) == limite and posicion < storage.estado_log(form_name)[1],
+    }
+
+
+def _esperar(form_name, estado, hasta):
+    """Esperar a que cambien los datos (o hasta `hasta`, en tiempo monotónico)"""
+    while time.monotonic() < hasta:
+        if storage.estado_log(form_name) != estado:
+            return
+        time.sleep(min(INTERVALO_ESPERA, max(0, hasta - time.monotonic())))
+
+
+def leer_cambios(form_name, cursor=None, limite=LIMITE, espera=0):
+    """Registros posteriores al cursor (None = desde el principio).
+
+    Con `espera` > 0 la lectura queda abierta hasta esos segundos si no hay
+    nada nuevo (long-poll). Devuelve {"cambios": [(registro, cursor_tras_él)],
+    "cursor", "reiniciado", "mas"}; "mas" indica que quedan registros sin leer.
+    Lanza CursorInvalido si el cursor no se puede interpretar.
+    """
+    storage.migrar_registros(form_name)
+    if cursor == CURSOR_FIN:
+        cursor = cursor_actual(form_name)
+    limite = max(1, min(limite, LIMITE_MAXIMO))
+    hasta = time.monotonic() + espera
+
+    while True:
+        estado = storage.estado_log(form_name)
+        resultado = _leer(form_name, cursor, limite, estado)
+        if resultado["cambios"] or resultado["reiniciado"] or time.monotonic() >= hasta:
+            return resultado
+        cursor = resultado["cursor"]
+        _esperar(form_name, estado, hasta)
@@ -0,0 +1,102 @@
+import json
+import unicodedata
+from functools import lru_cache
+
+from utils.formularios import obtener_formulario
+
+# Claves únicas de un formulario. En la definición (forms/<form>.json):
+#
+#   "identificador_unico": "Nip",                   un campo, valor exacto
+#   "claves_unicas": [
+#       {"campos": ["Correo"], "normalizar": true},  sin distinguir mayúsculas, espacios ni tildes
+#       {"campos": ["Nip", "Teléfono"]}              combinación de campos
+#   ]
+#
+# Cada clave se identifica por su definición en JSON canónico (el nombre de su
+# índice en los dos backends) y su valor en un registro es el JSON de los
+# valores de sus campos. Un registro sin alguno de esos campos (o con uno
+# vacío) no se controla en esa clave, como NULL en un índice UNIQUE.
+
+
+def definir_clave(campos, normalizar=False):
+    """Clave (JSON canónico) para una lista de campos"""
+    return json.dumps({"campos": list(campos), "normalizar": bool(normalizar)},
+                      ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def error_claves(config):
+    """Mensaje de error si `claves_unicas` está mal definido, o None"""
+    definiciones = config.get("claves_unicas", [])
+    if not isinstance(definiciones, list):
+        return "claves_unicas debe ser una lista"
+    for definicion in definiciones:
+        campos = definicion.get("campos") if isinstance(definicion, dict) else None
+        if isinstance(campos, str):
+            campos = [campos]
+        if not campos or not isinstance(campos, list) or not all(isinstance(c, str) and c for c in campos):
+            return "Cada clave única necesita una lista de campos"
+    return None
+
+
+def claves_config(config):
+    """Claves únicas de una definición de formulario, sin repetir"""
+    claves = []
+    if config.get("identificador_unico"):
+        claves.append(definir_clave([config["identificador_unico"]]))
+    if error_claves(config) is None:
+        for definicion in config.get("claves_unicas", []):
+            campos = definicion["campos"]
+            claves.append(definir_clave([campos] if isinstance(campos, str) else campos,
+                                        definicion.get("normalizar", False)))
+    return list(dict.fromkeys(claves))
+
+
+def claves_formulario(form_name):
+    try:
+        config = obtener_formulario(form_name)
+    except json.JSONDecodeError:
+        config = None
+    return claves_config(config) if config else []
+
+
+@lru_cache(maxsize=256)
+def campos_clave(clave):
+    """(campos, normalizar) de una clave"""
+    definicion = json.loads(clave)
+    return tuple(definicion["campos"]), definicion["normalizar"]
+
+
+def normalizar_texto(texto):
+    """Texto sin tildes, en minúsculas (casefold) y con los espacios colapsados"""
+    descompuesto = unicodedata.normalize("NFKD", texto)
+    sin_tildes = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return " ".join(sin_tildes.casefold().split())
+
+
+def _componente(valor, normalizar):
+    # Los valores con comas se guardan como listas (ver storage._normalizar)
+    if isinstance(valor, list):
+        valor = ",".join(str(v) for v in valor)
+    if isinstance(valor, str) and normalizar:
+        valor = normalizar_texto(valor)
+    return valor
+
+
+def valor_clave(clave, data):
+    """Valor de la clave en un registro, o None si le falta alguno de los campos"""
+    campos, normalizar = campos_clave(clave)
+    valores = []
+    for campo in campos:
+        valor = _componente(data.get(campo), normalizar)
+        if valor is None or valor == "":
+            return None
+        valores.append(valor)
+    return json.dumps(valores, ensure_ascii=False, separators=(",", ":"))
+
+
+def describir(clave, data):
+    """Texto para mensajes de error: "Nip y Teléfono: 123 / 5550000" """
+    campos, _ = campos_clave(clave)
+    nombres = campos[0] if len(campos) == 1 else ", ".join(campos[:-1]) + " y " + campos[-1]
+    valores = " / ".join(str(_componente(data.get(campo), False)) for campo in campos)
+    return f"{nombres}: {valores}"
@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import uuid
+import atexit
+import threading
+
+from utils import storage
+from utils.bloqueos import bloquear_sin_esperar
+from utils.claves import claves_formulario, valor_clave
+from utils.metricas import logger, medir
+
+# Escritura diferida (opcional, config ESCRITURA_DIFERIDA): el envío se
+# confirma en cuanto queda anexado (con fsync) a un diario pequeño del worker
+# en data/diario/, y un hilo en segundo plano lo pasa por lotes a los datos del
+# formulario con storage.guardar_registros. Cada worker bloquea su diario
+# mientras vive; un diario sin bloquear es de un proceso caído y se reaplica.
+#
+# Los registros llevan `_id` para no duplicarlos si la caída fue entre el
+# guardado del lote y el borrado del diario.
+
+# Segundos máximos entre vaciados y registros que fuerzan un vaciado antes
+INTERVALO_VACIADO = 0.5
+LOTE_MAXIMO = 200
+
+_lock = threading.Lock()           # cola y diario actual
+_lock_vaciado = threading.Lock()   # un vaciado a la vez
+_evento = threading.Event()
+# Registros confirmados pendientes de guardar: [(formulario, registro)]
+_cola = []
+# pid: proceso dueño (con fork, el hijo arranca su propio diario e hilo);
+# diario: archivo abierto y bloqueado; anteriores: diarios ya rotados cuyos
+# registros siguen en la cola (se borran cuando se guardan)
+_estado = {"pid": None, "diario": None, "anteriores": []}
+
+
+def _carpeta_diario():
+    return os.path.join(storage.DATA_DIR, "diario")
+
+
+def _abrir_diario(intentos=5):
+    """Crear y bloquear un diario nuevo.
+
+    Entre crearlo y bloquearlo, el `recuperar` de otro worker que arranca
+    puede tomarlo por huérfano (bloquearlo o borrarlo): en ese caso se
+    descarta y se prueba con otro nombre. Lanza OSError si no se consigue.
+    """
+    carpeta = _carpeta_diario()
+    os.makedirs(carpeta, exist_ok=True)
+    for _ in range(intentos):
+        ruta = os.path.join(carpeta, f"{os.getpid()}-{time.time_ns()}.jsonl")
+        diario = open(ruta, "a+b")
+        if bloquear_sin_esperar(diario) and os.fstat(diario.fileno()).st_nlink > 0:
+            return diario
+        diario.close()
+    raise OSError(f"No se pudo bloquear un diario de escritura diferida en {carpeta}")
+
+
+def _asegurar_hilo():
+    """Abrir el diario y arrancar el hilo de vaciado en este proceso (una vez)"""
+    if _estado["pid"] == os.getpid():
+        return
+    with _lock:
+        if _estado["pid"] == os.getpid():
+            return
+        _cola.clear()  # Lo heredado por fork lo vacía el proceso padre
+        _estado.update(pid=os.getpid(), diario=_abrir_diario(), anteriores=[])
+        threading.Thread(target=_trabajar, name="escritura-diferida", daemon=True).start()
+
+
+def _trabajar():
+    while True:
+        _evento.wait(INTERVALO_VACIADO)
+        _evento.clear()
+        try:
+            vaciar()
+        except Exception:
+            logger.exception("Escritura diferida: error al vaciar la cola")
+
+
+@medir("encolar_registro")
+def encolar(form_name, data):
+    """Confirmar un registro en el diario; se guarda en segundo plano"""
+    _asegurar_hilo()
+    storage.preparar_registros(form_name, [data])
+    data.setdefault("_id", uuid.uuid4().hex)
+    linea = json.dumps({"formulario": form_name, "registro": data}, ensure_ascii=False) + "\n"
+
+    with _lock:
+        diario = _estado["diario"]
+        diario.write(linea.encode("utf-8"))
+        diario.flush()
+        os.fsync(diario.fileno())
+        _cola.append((form_name, data))
+        if len(_cola) >= LOTE_MAXIMO:
+            _evento.set()
+
+
+def pendiente_duplicado(form_name, data):
+    """Primera clave única que `data` repite con un registro aún en cola (de este worker), o None"""
+    with _lock:
+        pendientes = [reg for nombre, reg in _cola if nombre == form_name]
+    if not pendientes:
+        return None
+    for clave in claves_formulario(form_name):
+        valor = valor_clave(clave, data)
+        if valor is not None and any(valor_clave(clave, reg) == valor for reg in pendientes):
+            return clave
+    return None
+
+
+def _agrupar(registros):
+    por_formulario = {}
+    for form_name, data in registros:
+        por_formulario.setdefault(form_name, []).append(data)
+    return por_formulario
+
+
+def _guardar_lote(form_name, registros, resueltos):
+    """Guardar un lote; si el backend rechaza un duplicado, guardar uno por uno.
+
+    Agrega a `resueltos` el `_id` de cada registro guardado o descartado, así
+    un error a mitad de camino no vuelve a encolar lo que ya se escribió.
+    """
+    try:
+        storage.guardar_registros(form_name, registros)
+    except storage.RegistroDuplicado:
+        for data in registros:
+            try:
+                storage.guardar_registros(form_name, [data])
+            except storage.RegistroDuplicado:
+                logger.warning("Escritura diferida: registro duplicado descartado en %s", form_name)
+            resueltos.add(data.get("_id"))
+    else:
+        resueltos.update(data.get("_id") for data in registros)
+
+
+@medir("vaciar_escritura_diferida")
+def vaciar():
+    """Guardar todo lo que está en cola y borrar los diarios ya aplicados"""
+    with _lock_vaciado:
+        with _lock:
+            if not _cola:
+                return
+            # Rotar: lo que llegue desde ahora va a un diario nuevo (abierto
+            # antes de tocar la cola, por si falla)
+            nuevo = _abrir_diario()
+            lote = list(_cola)
+            _cola.clear()
+            _estado["anteriores"].append(_estado["diario"])
+            _estado["diario"] = nuevo
+
+        resueltos = set()
+        try:
+            for form_name, registros in _agrupar(lote).items():
+                _guardar_lote(form_name, registros, resueltos)
+        except Exception:
+            # Devolver a la cola solo lo que no se guardó (otros formularios del
+            # lote pudieron escribirse); sus diarios se conservan hasta guardarlo
+            with _lock:
+                _cola[:0] = [(form_name, data) for form_name, data in lote if data.get("_id") not in resueltos]
+            raise
+
+        with _lock:
+            anteriores, _estado["anteriores"] = _estado["anteriores"], []
+        for diario in anteriores:
+            os.remove(diario.name)
+            diario.close()
+
+
+def _leer_diario(diario):
+    diario.seek(0)
+    for linea in diario:
+        if not linea.endswith(b"\n"):
+            break  # Escritura interrumpida: nunca se confirmó
+        try:
+            entrada = json.loads(linea)
+        except json.JSONDecodeError:
+            continue
+        yield entrada["formulario"], entrada["registro"]
+
+
+def recuperar():
+    """Reaplicar los diarios de procesos caídos. Devuelve los registros recuperados"""
+    carpeta = _carpeta_diario()
+    if not os.path.isdir(carpeta):
+        return 0
+
+    recuperados = 0
+    for archivo in sorted(os.listdir(carpeta)):
+        ruta = os.path.join(carpeta, archivo)
+        with open(ruta, "a+b") as diario:
+            # Bloqueado: es de un worker vivo. Sin enlaces: otro ya lo recuperó
+            if not bloquear_sin_esperar(diario) or os.fstat(diario.fileno()).st_nlink == 0:
+                continue
+
+            for form_name, registros in _agrupar(_leer_diario(diario)).items():
+                ids = {data.get("_id") for data in registros}
+                guardados = {reg.get("_id") for reg in storage.iterar_registros(form_name)
+                             if reg.get("_id") in ids}
+                faltantes = [data for data in registros if data.get("_id") not in guardados]
+                if faltantes:
+                    _guardar_lote(form_name, faltantes, set())
+                    recuperados += len(faltantes)
+            os.remove(ruta)
+
+    if recuperados:
+        logger.warning("Escritura diferida: %d registros recuperados del diario", recuperados)
+    return recuperados
+
+
+def iniciar():
+    """Recuperar diarios pendientes y vaciar la cola al terminar el proceso"""
+    recuperar()
+    atexit.register(vaciar)
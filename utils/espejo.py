@@ -0,0 +1,139 @@
+import os
+import json
+import sqlite3
+
+from utils import storage
+
+# Espejo SQLite de data/<form>.jsonl para paginar, ordenar y buscar registros
+# sin cargar el archivo completo. Se pone al día leyendo solo lo anexado.
+
+POR_PAGINA = 50
+
+
+def _ruta_espejo(form_name):
+    return os.path.join(storage.DATA_DIR, f"{form_name}.sqlite3")
+
+
+def _conectar(form_name):
+    conn = sqlite3.connect(_ruta_espejo(form_name), timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS registros (id INTEGER PRIMARY KEY, datos TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS columnas (campo TEXT PRIMARY KEY, columna TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor INTEGER);
+    """)
+    return conn
+
+
+def _meta(conn, clave):
+    fila = conn.execute("SELECT valor FROM meta WHERE clave = ?", (clave,)).fetchone()
+    return fila[0] if fila else None
+
+
+def _columnas(conn):
+    """Mapa campo -> columna SQL (c1, c2, ...); los nombres de campo no son identificadores válidos"""
+    return dict(conn.execute("SELECT campo, columna FROM columnas ORDER BY rowid"))
+
+
+def _valor_columna(valor):
+    if isinstance(valor, list):
+        return "|".join(str(v) for v in valor)
+    return valor
+
+
+def sincronizar(form_name):
+    """Poner el espejo al día con el log. Devuelve la conexión abierta"""
+    storage.migrar_registros(form_name)
+    conn = _conectar(form_name)
+    inodo, tamaño = storage.estado_log(form_name)
+    if _meta(conn, "inodo") == inodo and _meta(conn, "offset") == tamaño:
+        return conn
+
+    conn.execute("BEGIN IMMEDIATE")  # Un solo worker sincroniza a la vez
+    try:
+        offset = _meta(conn, "offset") or 0
+        # Log reemplazado o truncado: reconstruir desde cero
+        if _meta(conn, "inodo") != inodo or tamaño < offset:
+            conn.execute("DELETE FROM registros")
+            offset = 0
+
+        columnas = _columnas(conn)
+        for reg, offset in storage.leer_log_desde(form_name, offset):
+            if not isinstance(reg, dict):
+                continue
+            for campo in reg:
+                if campo not in columnas:
+                    columna = f"c{len(columnas) + 1}"
+                    conn.execute(f"ALTER TABLE registros ADD COLUMN {columna} TEXT")
+                    conn.execute(f"CREATE INDEX idx_{columna} ON registros ({columna})")
+                    conn.execute("INSERT INTO columnas (campo, columna) VALUES (?, ?)", (campo, columna))
+                    columnas[campo] = columna
+            nombres = ["datos"] + [columnas[campo] for campo in reg]
+            valores = [json.dumps(reg, ensure_ascii=False)] + [_valor_columna(v) for v in reg.values()]
+            conn.execute(
+                f"INSERT INTO registros ({', '.join(nombres)}) VALUES ({', '.join('?' * len(nombres))})",
+                valores,
+            )
+
+        conn.execute("INSERT OR REPLACE INTO meta (clave, valor) VALUES ('inodo', ?)", (inodo,))
+        conn.execute("INSERT OR REPLACE INTO meta (clave, valor) VALUES ('offset', ?)", (offset,))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        conn.close()
+        raise
+    return conn
+
+
+def pagina_registros(form_name, pagina=1, por_pagina=POR_PAGINA, orden=None, descendente=False,
+                     buscar=None, campo_busqueda=None):
+    """Consultar una página de registros.
+
+    Devuelve {"campos", "registros", "total", "pagina", "paginas"}. `orden` y
+    `campo_busqueda` son nombres de campo; sin `campo_busqueda` se busca en todos.
+    Los metadatos internos (`_fecha`, `_seq`...) no se muestran ni se buscan,
+    igual que en las exportaciones.
+    """
+    conn = sincronizar(form_name)
+    try:
+        columnas = {campo: columna for campo, columna in _columnas(conn).items() if not campo.startswith("_")}
+        condiciones, parametros = [], []
+        if buscar:
+            if campo_busqueda in columnas:
+                condiciones.append(f"{columnas[campo_busqueda]} LIKE ?")
+                parametros.append(f"%{buscar}%")
+            elif columnas:
+                condiciones.append("(" + " OR ".join(f"{c} LIKE ?" for c in columnas.values()) + ")")
+                parametros.extend([f"%{buscar}%"] * len(columnas))
+        where = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+        total = conn.execute(f"SELECT COUNT(*) FROM registros{where}", parametros).fetchone()[0]
+        paginas = max(1, -(-total // por_pagina))
+        pagina = min(max(1, pagina), paginas)
+
+        columna_orden = columnas.get(orden, "id")
+        direccion = "DESC" if descendente else "ASC"
+        filas = conn.execute(
+            f"SELECT datos FROM registros{where} ORDER BY {columna_orden} {direccion}, id {direccion} "
+            f"LIMIT ? OFFSET ?",
+            parametros + [por_pagina, (pagina - 1) * por_pagina],
+        ).fetchall()
+    finally:
+        conn.close()
+
+    return {
+        "campos": list(columnas),
+        "registros": [json.loads(datos) for (datos,) in filas],
+        "total": total,
+        "pagina": pagina,
+        "paginas": paginas,
+    }
+
+
+def eliminar_espejo(form_name):
+    """Eliminar el espejo SQLite de un formulario"""
+    for sufijo in ("", "-wal", "-shm"):
+        ruta = _ruta_espejo(form_name) + sufijo
+        if os.path.exists(ruta):
+            os.remove(ruta)
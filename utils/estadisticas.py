@@ -0,0 +1,123 @@
+import os
+import json
+
+from utils import storage
+from utils.bloqueos import escribir_atomico
+from utils.formularios import obtener_formulario
+
+# Estadísticas por formulario mantenidas de forma incremental en
+# data/<form>.stats.json: se actualizan con cada registro guardado, sin
+# volver a recorrer los datos. Como el índice de identificadores, recuerdan
+# hasta qué byte del log contaron para ponerse al día si hiciera falta.
+
+TIPOS_CON_CONTEO = ("select", "radio", "checkbox")
+
+
+def _ruta_estadisticas(form_name):
+    return os.path.join(storage.DATA_DIR, f"{form_name}.stats.json")
+
+
+def _vacias():
+    return {
+        "inodo": None,
+        "offset": 0,
+        "total": 0,
+        "sin_fecha": 0,
+        "por_dia": {},
+        "por_hora": {},
+        "valores": {},
+    }
+
+
+def _cargar(form_name):
+    try:
+        with open(_ruta_estadisticas(form_name), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return _vacias()
+
+
+def _guardar(form_name, stats):
+    escribir_atomico(_ruta_estadisticas(form_name), json.dumps(stats, ensure_ascii=False))
+
+
+def campos_con_conteo(form_name):
+    """Campos select/radio/checkbox de la definición actual del formulario"""
+    try:
+        config = obtener_formulario(form_name)
+    except json.JSONDecodeError:
+        config = None
+    if not config:
+        return []
+    return [c["nombre"] for c in config.get("campos", []) if c.get("tipo") in TIPOS_CON_CONTEO]
+
+
+def _sumar(stats, reg, campos):
+    stats["total"] += 1
+
+    fecha = reg.get("_fecha")
+    if fecha:
+        dia, hora = fecha[:10], fecha[:13]
+        stats["por_dia"][dia] = stats["por_dia"].get(dia, 0) + 1
+        stats["por_hora"][hora] = stats["por_hora"].get(hora, 0) + 1
+    else:
+        stats["sin_fecha"] += 1
+
+    for campo in campos:
+        valor = reg.get(campo)
+        if valor in (None, "", []):
+            continue
+        conteo = stats["valores"].setdefault(campo, {})
+        for v in valor if isinstance(valor, list) else [valor]:
+            conteo[v] = conteo.get(v, 0) + 1
+
+
+def _poner_al_dia(stats, form_name, campos):
+    """Contar lo anexado al log desde la última vez. Devuelve las estadísticas"""
+    inodo, tamaño = storage.estado_log(form_name)
+    # Log reemplazado o truncado: volver a contar desde cero
+    if stats["inodo"] != inodo or tamaño < stats["offset"]:
+        stats = _vacias()
+        stats["inodo"] = inodo
+
+    for reg, offset in storage.leer_log_desde(form_name, stats["offset"]):
+        stats["offset"] = offset
+        if isinstance(reg, dict):
+            _sumar(stats, reg, campos)
+    return stats
+
+
+def registrar(form_name, registros, inicio, fin):
+    """Sumar registros recién anexados (bytes inicio..fin del log).
+
+    Se llama desde guardar_registros con el bloqueo del formulario tomado.
+    """
+    campos = campos_con_conteo(form_name)
+    stats = _cargar(form_name)
+    inodo, _ = storage.estado_log(form_name)
+
+    if stats["inodo"] == inodo and stats["offset"] == inicio:
+        for data in registros:
+            _sumar(stats, data, campos)
+        stats["offset"] = fin
+    else:
+        stats = _poner_al_dia(stats, form_name, campos)
+    _guardar(form_name, stats)
+
+
+def obtener_estadisticas(form_name):
+    """Estadísticas del formulario, poniéndolas al día solo si quedaron atrás"""
+    stats = _cargar(form_name)
+    storage.migrar_registros(form_name)
+    inodo, tamaño = storage.estado_log(form_name)
+    if stats["inodo"] != inodo or stats["offset"] != tamaño:
+        with storage.bloqueo_formulario(form_name):
+            stats = _poner_al_dia(_cargar(form_name), form_name, campos_con_conteo(form_name))
+            _guardar(form_name, stats)
+    return stats
+
+
+def eliminar_estadisticas(form_name):
+    ruta = _ruta_estadisticas(form_name)
+    if os.path.exists(ruta):
+        os.remove(ruta)
@@ -0,0 +1,120 @@
+import csv
+import json
+import zlib
+from io import StringIO
+from itertools import chain
+
+# Filas de CSV/JSONL que se agrupan antes de enviar cada fragmento
+FILAS_POR_FRAGMENTO = 200
+
+FORMATOS = {
+    "csv": ("text/csv", "csv"),
+    "jsonl": ("application/x-ndjson", "jsonl"),
+}
+
+
+def _coincide(valor, esperado):
+    """Un filtro coincide por igualdad, o por pertenencia si el valor es una lista"""
+    if isinstance(valor, list):
+        return esperado in valor
+    return valor == esperado
+
+
+def filtrar_registros(registros, filtros=None, desde=None, hasta=None):
+    """Filtrar registros de forma perezosa.
+
+    `filtros` es una lista de (campo, valor). `desde`/`hasta` son fechas o
+    fechas-hora ISO (inclusivas) comparadas con el metadato `_fecha`; los
+    registros sin fecha quedan fuera si se pide un rango.
+    """
+    for reg in registros:
+        if filtros and not all(_coincide(reg.get(campo), valor) for campo, valor in filtros):
+            continue
+        if desde or hasta:
+            fecha = reg.get("_fecha")
+            if not fecha:
+                continue
+            if desde and fecha < desde:
+                continue
+            if hasta and fecha[:len(hasta)] > hasta:
+                continue
+        yield reg
+
+
+def _valor_csv(valor):
+    if valor is None:
+        return ""
+    return "|".join(valor) if isinstance(valor, list) else valor
+
+
+def exportar_csv(registros, columnas):
+    """Generar el CSV en fragmentos de texto, una fila por registro"""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columnas)
+
+    for i, reg in enumerate(registros, 1):
+        writer.writerow([_valor_csv(reg.get(col)) for col in columnas])
+        if i % FILAS_POR_FRAGMENTO == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def exportar_jsonl(registros, columnas=None):
+    """Generar JSON Lines en fragmentos de texto"""
+    lineas = []
+    for reg in registros:
+        if columnas:
+            reg = {col: reg.get(col) for col in columnas}
+        lineas.append(json.dumps(reg, ensure_ascii=False))
+        if len(lineas) == FILAS_POR_FRAGMENTO:
+            yield "\n".join(lineas) + "\n"
+            lineas = []
+
+    if lineas:
+        yield "\n".join(lineas) + "\n"
+
+
+def exportar_json(registros):
+    """Generar un arreglo JSON (como el data/<form>.json heredado) en fragmentos de texto"""
+    separador = "[\n"
+    lineas = []
+    for reg in registros:
+        lineas.append(separador + json.dumps(reg, ensure_ascii=False, indent=4))
+        separador = ",\n"
+        if len(lineas) == FILAS_POR_FRAGMENTO:
+            yield "".join(lineas)
+            lineas = []
+
+    yield "".join(lineas) + ("\n]\n" if separador != "[\n" else "[]\n")
+
+
+def comprimir_gzip(fragmentos):
+    """Comprimir en gzip al vuelo una secuencia de fragmentos de texto"""
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: formato gzip
+    for fragmento in fragmentos:
+        datos = compresor.compress(fragmento.encode("utf-8"))
+        if datos:
+            yield datos
+    yield compresor.flush()
+
+
+def columnas_exportacion(registros, columnas_formulario=None):
+    """Columnas por defecto: la unión de campos de todas las versiones del
+    formulario o, si no hay definición, las claves del primer registro (sin
+    metadatos internos).
+
+    Devuelve (columnas, registros) porque el iterador puede haberse consumido.
+    """
+    if columnas_formulario:
+        return list(columnas_formulario), registros
+
+    registros = iter(registros)
+    primero = next(registros, None)
+    if primero is None:
+        return [], registros
+    columnas = [k for k in primero if not k.startswith("_")]
+    return columnas, chain([primero], registros)
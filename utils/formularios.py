@@ -0,0 +1,259 @@
+import os
+import json
+import time
+import hashlib
+
+from utils.bloqueos import bloqueo_archivo, escribir_atomico
+from utils.validators import ValidadorFormulario
+
+# Carpeta de definiciones de formularios; create_app la toma de la
+# configuración (FORMS_DIR) con configurar_carpeta
+FORMS_DIR = os.getenv("FORMS_DIR", "forms")
+
+# Segundos durante los que una entrada en caché se da por buena sin volver
+# a consultar el disco. Los cambios hechos desde la app se ven al instante;
+# los de otros workers o ediciones a mano, como mucho tras este intervalo.
+INTERVALO_VERIFICACION = 1.0
+
+# nombre -> {"firma": (mtime_ns, tamaño), "config": dict, "verificado": float,
+#           "validador": ValidadorFormulario (se compila al primer uso),
+#           "version": int, "versiones": {versión: [campos]} (al primer uso),
+#           "paginas": {variante: (html, etag, mtime)} (al primer GET)}
+_cache = {}
+# Listado de nombres de formularios, invalidado por el mtime de la carpeta
+_listado = {"firma": None, "nombres": [], "verificado": 0.0}
+
+
+def configurar_carpeta(ruta):
+    """Usar `ruta` como carpeta de formularios (descarta la caché)"""
+    global FORMS_DIR
+    FORMS_DIR = ruta
+    invalidar_formulario()
+
+
+def ruta_formulario(nombre):
+    return os.path.join(FORMS_DIR, f"{nombre}.json")
+
+
+def _ruta_versiones(nombre):
+    """Historial de esquemas: forms/versiones/<nombre>.json = {versión: [campos]}"""
+    return os.path.join(FORMS_DIR, "versiones", f"{nombre}.json")
+
+
+def _firma(ruta):
+    """Firma de un archivo o carpeta para detectar cambios (mtime y tamaño)"""
+    try:
+        stat = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def obtener_formulario(nombre):
+    """Configuración de un formulario (en caché) o None si no existe.
+
+    El diccionario devuelto es compartido: no modificarlo.
+    Lanza json.JSONDecodeError si el archivo no es JSON válido.
+    """
+    ahora = time.monotonic()
+    entrada = _cache.get(nombre)
+    if entrada and ahora - entrada["verificado"] < INTERVALO_VERIFICACION:
+        return entrada["config"]
+
+    ruta = ruta_formulario(nombre)
+    firma = _firma(ruta)
+    if firma is None:
+        _cache.pop(nombre, None)
+        return None
+
+    if entrada is None or entrada["firma"] != firma:
+        with open(ruta, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        entrada = {"firma": firma, "config": config}
+        _cache[nombre] = entrada
+
+    entrada["verificado"] = ahora
+    return entrada["config"]
+
+
+def obtener_validador(nombre):
+    """Validador precompilado del formulario, reconstruido cuando cambia su definición"""
+    config = obtener_formulario(nombre)
+    if config is None:
+        return None
+
+    entrada = _cache.get(nombre, {})
+    validador = entrada.get("validador")
+    if validador is None:
+        validador = ValidadorFormulario(config.get("campos", []))
+        entrada["validador"] = validador
+    return validador
+
+
+def pagina_formulario(nombre, variante, renderizar):
+    """HTML del formulario en caché hasta que cambie su definición.
+
+    `variante` separa versiones de la página (p. ej. "publico") y
+    `renderizar()` la genera si falta. Devuelve (html, etag, mtime del JSON)
+    o None si el formulario no existe.
+    """
+    if obtener_formulario(nombre) is None:
+        return None
+
+    entrada = _cache.get(nombre, {})
+    paginas = entrada.setdefault("paginas", {})
+    pagina = paginas.get(variante)
+    if pagina is None:
+        html = renderizar()
+        etag = hashlib.sha256(html.encode("utf-8")).hexdigest()[:32]
+        pagina = paginas[variante] = (html, etag, entrada["firma"][0] / 1e9)
+    return pagina
+
+
+# -------------------
+# Versiones del esquema
+# -------------------
+# Cada cambio en la lista de campos crea una versión nueva del esquema. Los
+# registros guardan la versión con la que se enviaron (`_version`) y el CSV se
+# arma con la unión de campos de todas las versiones, así un formulario se
+# puede editar en vivo sin reescribir los datos ya guardados.
+
+def _nombres_campos(config):
+    return [c["nombre"] for c in config.get("campos", []) if c.get("nombre")]
+
+
+def _leer_versiones(nombre):
+    try:
+        with open(_ruta_versiones(nombre), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _registrar_version(nombre, config):
+    """Versión del esquema actual, agregándola al historial si sus campos cambiaron.
+
+    Devuelve (versión, versiones). Detecta también ediciones hechas a mano.
+    """
+    campos = _nombres_campos(config)
+    versiones = _leer_versiones(nombre)
+    if versiones:
+        ultima = max(versiones, key=int)
+        if versiones[ultima] == campos:
+            return int(ultima), versiones
+
+    ruta = _ruta_versiones(nombre)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with bloqueo_archivo(f"{ruta}.lock"):
+        # Otro worker pudo haber registrado la versión mientras esperábamos
+        versiones = _leer_versiones(nombre)
+        ultima = max(versiones, key=int) if versiones else "0"
+        if versiones.get(ultima) != campos:
+            ultima = str(int(ultima) + 1)
+            versiones[ultima] = campos
+            escribir_atomico(ruta, json.dumps(versiones, ensure_ascii=False, indent=2))
+    return int(ultima), versiones
+
+
+def _entrada_versiones(nombre):
+    config = obtener_formulario(nombre)
+    if config is None:
+        return None
+
+    entrada = _cache.get(nombre, {})
+    if "version" not in entrada:
+        entrada["version"], entrada["versiones"] = _registrar_version(nombre, config)
+    return entrada
+
+
+def version_formulario(nombre):
+    """Versión actual del esquema del formulario (None si no existe)"""
+    entrada = _entrada_versiones(nombre)
+    return entrada["version"] if entrada else None
+
+
+def columnas_formulario(nombre):
+    """Unión de los campos de todas las versiones: los actuales primero,
+    después los retirados o renombrados (de la versión más reciente a la más vieja).
+
+    Lista vacía si el formulario no existe.
+    """
+    entrada = _entrada_versiones(nombre)
+    if not entrada:
+        return []
+
+    columnas = []
+    versiones = entrada["versiones"]
+    for version in sorted(versiones, key=int, reverse=True):
+        for campo in versiones[version]:
+            if campo not in columnas:
+                columnas.append(campo)
+    return columnas
+
+
+def _nombres_formularios():
+    ahora = time.monotonic()
+    if _listado["firma"] is not None and ahora - _listado["verificado"] < INTERVALO_VERIFICACION:
+        return _listado["nombres"]
+
+    firma = _firma(FORMS_DIR)
+    if firma != _listado["firma"]:
+        nombres = []
+        if firma is not None:
+            for archivo in os.listdir(FORMS_DIR):
+                if archivo.endswith(".json"):
+                    nombres.append(os.path.splitext(archivo)[0])
+        _listado["nombres"] = nombres
+        _listado["firma"] = firma
+
+    _listado["verificado"] = ahora
+    return _listado["nombres"]
+
+
+def listar_formularios():
+    """Lista de (nombre, config) de todos los formularios con JSON válido"""
+    formularios = []
+    for nombre in _nombres_formularios():
+        try:
+            config = obtener_formulario(nombre)
+        except json.JSONDecodeError:
+            continue
+        if config is not None:
+            formularios.append((nombre, config))
+    return formularios
+
+
+def invalidar_formulario(nombre=None):
+    """Descartar de la caché un formulario (o todos) y el listado"""
+    if nombre is None:
+        _cache.clear()
+    else:
+        _cache.pop(nombre, None)
+    _listado["firma"] = None
+
+
+def guardar_formulario(nombre, config):
+    """Guardar la definición de un formulario, registrar la versión de su
+    esquema e invalidar la caché"""
+    # Un formulario anterior al historial de versiones deja su esquema registrado antes de cambiar
+    try:
+        anterior = obtener_formulario(nombre)
+    except json.JSONDecodeError:
+        anterior = None
+    if anterior is not None:
+        _registrar_version(nombre, anterior)
+
+    os.makedirs(FORMS_DIR, exist_ok=True)
+    escribir_atomico(ruta_formulario(nombre), json.dumps(config, ensure_ascii=False, indent=2))
+    invalidar_formulario(nombre)
+    _registrar_version(nombre, config)
+
+
+def borrar_formulario(nombre):
+    """Eliminar la definición de un formulario. Devuelve False si no existía"""
+    ruta = ruta_formulario(nombre)
+    if not os.path.exists(ruta):
+        return False
+    os.remove(ruta)
+    invalidar_formulario(nombre)
+    return True
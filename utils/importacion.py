@@ -0,0 +1,133 @@
+import io
+import csv
+import json
+
+from utils.storage import guardar_registros, registro_duplicado, RegistroDuplicado
+from utils.claves import claves_config, valor_clave, describir
+from utils.lectura import iterar_arreglo_json
+
+FORMATOS_IMPORTACION = ("csv", "jsonl", "json")
+# Registros válidos que se guardan juntos; la memoria no depende del tamaño del
+# archivo. Cada lote se confirma por separado: si la importación se corta, los
+# lotes anteriores quedan guardados
+LOTE_IMPORTACION = 500
+
+
+def detectar_formato(nombre_archivo, formato=None):
+    """Formato pedido explícitamente o deducido de la extensión del archivo"""
+    if formato:
+        return formato if formato in FORMATOS_IMPORTACION else None
+    nombre_archivo = (nombre_archivo or "").lower()
+    if nombre_archivo.endswith(".csv"):
+        return "csv"
+    if nombre_archivo.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    if nombre_archivo.endswith(".json"):
+        return "json"
+    return None
+
+
+def leer_filas(stream, formato):
+    """Iterar (número_de_fila, fila_o_error) leyendo el archivo por partes.
+
+    Si una fila no se puede interpretar se entrega el mensaje de error (str).
+    """
+    texto = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if formato == "csv":
+        for numero, fila in enumerate(csv.DictReader(texto), 1):
+            yield numero, fila
+        return
+
+    if formato == "json":
+        # Arreglo JSON (p. ej. una descarga .json): se lee de a un elemento
+        numero = 0
+        try:
+            for numero, fila in enumerate(iterar_arreglo_json(texto), 1):
+                yield numero, fila if isinstance(fila, dict) else "Cada elemento debe ser un objeto JSON"
+        except json.JSONDecodeError as e:
+            yield numero + 1, f"JSON inválido: {e}"
+        return
+
+    for numero, linea in enumerate(texto, 1):
+        if not linea.strip():
+            continue
+        try:
+            fila = json.loads(linea)
+        except json.JSONDecodeError as e:
+            yield numero, f"JSON inválido: {e}"
+            continue
+        yield numero, fila if isinstance(fila, dict) else "Cada línea debe ser un objeto JSON"
+
+
+def _guardar_lote(form_name, lote, errores):
+    """Guardar un lote de (número_de_fila, datos). Devuelve la cantidad guardada.
+
+    Si el backend rechaza el lote por una clave repetida (p. ej. un envío
+    público que llegó después de la verificación), se guarda fila por fila y
+    solo las repetidas quedan como rechazadas.
+    """
+    try:
+        guardar_registros(form_name, [datos for _, datos in lote])
+        return len(lote)
+    except RegistroDuplicado:
+        pass
+
+    guardados = 0
+    for numero, datos in lote:
+        try:
+            guardar_registros(form_name, [datos])
+            guardados += 1
+        except RegistroDuplicado as e:
+            errores.append({"fila": numero, "errores": {"general": str(e)}})
+    return guardados
+
+
+def importar_registros(form_name, config, validador, filas):
+    """Validar filas con las reglas del formulario y guardar las válidas por lotes.
+
+    Los duplicados de las claves únicas (ver utils/claves.py) se buscan en los
+    datos existentes (que incluyen los lotes ya guardados) y dentro del lote
+    en curso. Devuelve (cantidad_importada, errores_por_fila).
+    """
+    claves = claves_config(config)
+    vistos = set()  # (clave, valor) del lote en curso
+    validos = []
+    importados = 0
+    errores = []
+
+    for numero, fila in filas:
+        if isinstance(fila, str):
+            errores.append({"fila": numero, "errores": {"general": fila}})
+            continue
+
+        datos, errores_por_campo = validador.validar_fila(fila)
+
+        if claves and not errores_por_campo:
+            valores = [(clave, valor_clave(clave, datos)) for clave in claves]
+            repetida = next((clave for clave, valor in valores if (clave, valor) in vistos), None)
+            if repetida is not None:
+                errores_por_campo["general"] = f"Repetido en el archivo: {describir(repetida, datos)}"
+            else:
+                repetida = registro_duplicado(form_name, datos)
+                if repetida is not None:
+                    errores_por_campo["general"] = f"Ya existe un registro con {describir(repetida, datos)}"
+                else:
+                    vistos.update((clave, valor) for clave, valor in valores if valor is not None)
+
+        if errores_por_campo:
+            errores.append({"fila": numero, "errores": errores_por_campo})
+            continue
+
+        # Conservar la fecha original si la fila viene de una exportación JSON Lines
+        if isinstance(fila.get("_fecha"), str):
+            datos["_fecha"] = fila["_fecha"]
+        validos.append((numero, datos))
+
+        if len(validos) == LOTE_IMPORTACION:
+            importados += _guardar_lote(form_name, validos, errores)
+            validos, vistos = [], set()
+
+    if validos:
+        importados += _guardar_lote(form_name, validos, errores)
+    errores.sort(key=lambda error: error["fila"])
+    return importados, errores
@@ -0,0 +1,178 @@
+import os
+import sqlite3
+import threading
+
+from utils import storage
+from utils.claves import valor_clave, describir
+
+# Índices persistentes de claves únicas (ver utils/claves.py):
+# data/<form>.indices.sqlite3 guarda, por clave, los valores ya registrados
+# (clave primaria) y la generación y posición del log hasta donde leyó. Como
+# el espejo y las estadísticas, se pone al día leyendo solo lo anexado: la
+# memoria no depende de la cantidad de registros y el índice sobrevive a
+# reinicios de workers.
+
+# Versión del esquema: un índice de otra versión se descarta y se reconstruye
+ESQUEMA = 2
+
+# Conexiones abiertas por hilo (y por proceso: los workers de gunicorn hacen fork)
+_local = threading.local()
+
+
+def _ruta_indices(form_name):
+    return os.path.join(storage.DATA_DIR, f"{form_name}.indices.sqlite3")
+
+
+def _conectar(form_name):
+    """Conexión en caché; se reabre si el archivo se borró o se reemplazó"""
+    ruta = _ruta_indices(form_name)
+    try:
+        inodo = os.stat(ruta).st_ino
+    except FileNotFoundError:
+        inodo = None
+
+    if getattr(_local, "pid", None) != os.getpid():
+        _local.pid, _local.conexiones = os.getpid(), {}
+    conn, inodo_conn = _local.conexiones.get(ruta, (None, None))
+    if conn is not None and inodo is not None and inodo == inodo_conn:
+        return conn
+
+    if conn is not None:
+        conn.close()
+    os.makedirs(storage.DATA_DIR, exist_ok=True)
+    conn = sqlite3.connect(ruta, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if conn.execute("PRAGMA user_version").fetchone()[0] != ESQUEMA:
+        conn.executescript(f"""
+            BEGIN IMMEDIATE;
+            DROP TABLE IF EXISTS indices;
+            DROP TABLE IF EXISTS valores;
+            CREATE TABLE indices (
+                clave TEXT PRIMARY KEY,
+                generacion INTEGER,
+                posicion INTEGER NOT NULL
+            );
+            CREATE TABLE valores (
+                clave TEXT NOT NULL,
+                valor TEXT NOT NULL,
+                PRIMARY KEY (clave, valor)
+            ) WITHOUT ROWID;
+            PRAGMA user_version = {ESQUEMA};
+            COMMIT;
+        """)
+    _local.conexiones[ruta] = (conn, os.stat(ruta).st_ino)
+    return conn
+
+
+def _estado(conn, clave):
+    fila = conn.execute("SELECT generacion, posicion FROM indices WHERE clave = ?", (clave,)).fetchone()
+    return tuple(fila) if fila else None
+
+
+def _poner_al_dia(conn, form_name, clave):
+    """Agregar al índice lo anexado al log desde la última vez"""
+    if _estado(conn, clave) == storage.estado_log(form_name):
+        return
+
+    conn.execute("BEGIN IMMEDIATE")  # Un solo worker lo pone al día a la vez
+    try:
+        generacion, tamaño = storage.estado_log(form_name)
+        estado = _estado(conn, clave)
+        posicion = 0
+        # Log reemplazado o truncado: reconstruir desde cero
+        if estado is None or estado[0] != generacion or tamaño < estado[1]:
+            conn.execute("DELETE FROM valores WHERE clave = ?", (clave,))
+        else:
+            posicion = estado[1]
+
+        leido = [posicion]
+
+        def valores():
+            for reg, leido[0] in storage.leer_log_desde(form_name, posicion):
+                valor = valor_clave(clave, reg) if isinstance(reg, dict) else None
+                if valor is not None:
+                    yield clave, valor
+
+        conn.executemany("INSERT OR IGNORE INTO valores (clave, valor) VALUES (?, ?)", valores())
+        conn.execute(
+            "INSERT OR REPLACE INTO indices (clave, generacion, posicion) VALUES (?, ?, ?)",
+            (clave, generacion, leido[0]),
+        )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _existe(conn, clave, valor):
+    return conn.execute("SELECT 1 FROM valores WHERE clave = ? AND valor = ?", (clave, valor)).fetchone() is not None
+
+
+def existe(form_name, clave, valor):
+    """Validar si ya hay un registro con `valor` (ver claves.valor_clave) en la clave"""
+    conn = _conectar(form_name)
+    _poner_al_dia(conn, form_name, clave)
+    return _existe(conn, clave, valor)
+
+
+def verificar(form_name, claves, registros):
+    """Lanzar storage.RegistroDuplicado si algún registro repite una clave única,
+    contra lo ya guardado o dentro del mismo lote.
+
+    Se llama desde guardar_registros con el bloqueo del formulario tomado.
+    """
+    if not claves:
+        return
+    conn = _conectar(form_name)
+    for clave in claves:
+        _poner_al_dia(conn, form_name, clave)
+        vistos = set()
+        for data in registros:
+            valor = valor_clave(clave, data)
+            if valor is None:
+                continue
+            if valor in vistos or _existe(conn, clave, valor):
+                raise storage.RegistroDuplicado(f"Ya existe un registro con {describir(clave, data)}")
+            vistos.add(valor)
+
+
+def registrar(form_name, claves, registros, inicio, fin):
+    """Agregar registros recién anexados (posiciones inicio..fin) a los índices de `claves`.
+
+    Se llama desde guardar_registros con el bloqueo del formulario tomado. Un
+    índice que quedó atrás (o de una clave que ya no está configurada) se pone
+    al día en la próxima consulta.
+    """
+    if not claves or not os.path.exists(_ruta_indices(form_name)):
+        return
+
+    conn = _conectar(form_name)
+    generacion, _ = storage.estado_log(form_name)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for clave in claves:
+            if _estado(conn, clave) != (generacion, inicio):
+                continue
+            valores = (valor_clave(clave, data) for data in registros)
+            conn.executemany(
+                "INSERT OR IGNORE INTO valores (clave, valor) VALUES (?, ?)",
+                [(clave, valor) for valor in valores if valor is not None],
+            )
+            conn.execute("UPDATE indices SET posicion = ? WHERE clave = ?", (fin, clave))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def eliminar_indices(form_name):
+    """Eliminar los índices de un formulario (se reconstruyen en la próxima consulta)"""
+    conexiones = getattr(_local, "conexiones", {})
+    conn, _ = conexiones.pop(_ruta_indices(form_name), (None, None))
+    if conn is not None:
+        conn.close()
+    for sufijo in ("", "-wal", "-shm"):
+        ruta = _ruta_indices(form_name) + sufijo
+        if os.path.exists(ruta):
+            os.remove(ruta)
@@ -0,0 +1,116 @@
+import json
+
+from utils.metricas import logger
+
+# Lectura incremental de arreglos JSON (data/<form>.json heredado e
+# importaciones): los elementos se decodifican de a uno leyendo el archivo
+# por bloques, así la memoria depende del registro más grande y no del archivo.
+
+TAMAÑO_BLOQUE = 64 * 1024
+ESPACIOS = " \t\r\n\ufeff"
+
+
+class _Lector:
+    """Texto leído por bloques con una posición de lectura"""
+
+    def __init__(self, f, tamaño_bloque):
+        self.f = f
+        self.tamaño_bloque = tamaño_bloque
+        self.texto = ""
+        self.pos = 0
+        self.fin = False
+
+    def leer_mas(self, minimo=0):
+        """Agregar al menos un bloque (o `minimo` caracteres); False al final del archivo"""
+        if self.fin:
+            return False
+        bloque = self.f.read(max(self.tamaño_bloque, minimo))
+        if not bloque:
+            self.fin = True
+            return False
+        # Descartar lo ya consumido para no acumular el archivo entero
+        self.texto = self.texto[self.pos:] + bloque
+        self.pos = 0
+        return True
+
+    def siguiente(self):
+        """Siguiente carácter que no es espacio (sin consumirlo), o None al final"""
+        while True:
+            while self.pos < len(self.texto) and self.texto[self.pos] in ESPACIOS:
+                self.pos += 1
+            if self.pos < len(self.texto):
+                return self.texto[self.pos]
+            if not self.leer_mas():
+                return None
+
+
+def _error(lector, mensaje):
+    return json.JSONDecodeError(mensaje, lector.texto, lector.pos)
+
+
+def iterar_arreglo_json(f, tamaño_bloque=TAMAÑO_BLOQUE):
+    """Iterar los elementos de un arreglo JSON de primer nivel leído de `f` (texto).
+
+    Lanza json.JSONDecodeError si el contenido no es un arreglo válido; los
+    elementos anteriores al error ya fueron entregados.
+    """
+    decodificador = json.JSONDecoder()
+    lector = _Lector(f, tamaño_bloque)
+    if lector.siguiente() != "[":
+        raise _error(lector, "Se esperaba un arreglo JSON")
+    lector.pos += 1
+
+    primero = True
+    while True:
+        caracter = lector.siguiente()
+        if caracter == "]" and primero:
+            break
+        if not primero:
+            if caracter == "]":
+                break
+            if caracter != ",":
+                raise _error(lector, "Se esperaba ',' o ']'")
+            lector.pos += 1
+            lector.siguiente()
+
+        # Un elemento puede quedar cortado entre bloques: leer más y reintentar.
+        # Solo se acepta si después viene ',' o ']' (un número cortado como
+        # "12" de "123" también se decodifica)
+        faltante = lector.tamaño_bloque
+        while True:
+            try:
+                elemento, fin = decodificador.raw_decode(lector.texto, lector.pos)
+            except json.JSONDecodeError:
+                if lector.leer_mas(faltante):
+                    faltante *= 2  # Elementos muy grandes: menos reintentos
+                    continue
+                raise
+            siguiente = fin
+            while siguiente < len(lector.texto) and lector.texto[siguiente] in ESPACIOS:
+                siguiente += 1
+            if (siguiente == len(lector.texto) or lector.texto[siguiente] not in ",]") and lector.leer_mas(faltante):
+                faltante *= 2
+                continue
+            break
+
+        lector.pos = fin
+        primero = False
+        yield elemento
+
+    lector.pos += 1
+    if lector.siguiente() is not None:
+        raise _error(lector, "Contenido extra después del arreglo")
+
+
+def registros_json(ruta):
+    """Registros (diccionarios) de un archivo con un arreglo JSON, sin cargarlo entero.
+
+    Si el archivo está dañado se entregan los registros anteriores al error.
+    """
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            for elemento in iterar_arreglo_json(f):
+                if isinstance(elemento, dict):
+                    yield elemento
+    except json.JSONDecodeError as e:
+        logger.warning("JSON inválido en %s (%s): se leyeron los registros anteriores al error", ruta, e)
@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+from utils import basedatos, storage
+from utils.metricas import logger
+
+# Límites de envío de los formularios públicos: una cubeta de fichas (token
+# bucket) por IP y otra por formulario. El estado vive en data/limites.db
+# (SQLite en modo WAL) para que todos los workers de gunicorn lo compartan;
+# cada consulta es una transacción corta con BEGIN IMMEDIATE.
+#
+# También se descartan los reenvíos idénticos (doble clic, reintento del
+# navegador) de la misma IP dentro de una ventana de segundos, antes de
+# validar y guardar. Si la base no está disponible los límites no se aplican.
+
+# Conexión por hilo (ver utils/basedatos.py)
+_local = threading.local()
+# Operaciones entre limpiezas de cubetas llenas y huellas vencidas
+LIMPIAR_CADA = 1000
+_contador = {"operaciones": 0}
+
+
+def _ruta_db():
+    return os.path.join(storage.DATA_DIR, "limites.db")
+
+
+def _crear_tablas(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cubetas (
+            clave TEXT PRIMARY KEY,
+            fichas REAL NOT NULL,
+            actualizado REAL NOT NULL,
+            lleno REAL NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS envios (
+            huella TEXT PRIMARY KEY,
+            momento REAL NOT NULL
+        )
+    """)
+
+
+def _conectar():
+    # Perder el estado en una caída no importa: synchronous=OFF
+    return basedatos.conectar(_local, _ruta_db(), timeout=5, synchronous="OFF", preparar=_crear_tablas)
+
+
+def _tomar_ficha(conn, clave, por_minuto, ahora):
+    """Segundos de espera si la cubeta está vacía; 0 si se tomó una ficha.
+
+    La cubeta admite ráfagas de hasta `por_minuto` envíos y se rellena a
+    `por_minuto / 60` fichas por segundo.
+    """
+    por_segundo = por_minuto / 60
+    fila = conn.execute("SELECT fichas, actualizado FROM cubetas WHERE clave = ?", (clave,)).fetchone()
+    fichas = float(por_minuto) if fila is None else min(por_minuto, fila[0] + (ahora - fila[1]) * por_segundo)
+    if fichas < 1:
+        return (1 - fichas) / por_segundo
+
+    fichas -= 1
+    conn.execute(
+        "INSERT OR REPLACE INTO cubetas (clave, fichas, actualizado, lleno) VALUES (?, ?, ?, ?)",
+        (clave, fichas, ahora, ahora + (por_minuto - fichas) / por_segundo),
+    )
+    return 0
+
+
+def _toca_limpiar():
+    _contador["operaciones"] += 1
+    return _contador["operaciones"] % LIMPIAR_CADA == 0
+
+
+def permitir_envio(form_name, ip, por_ip, por_formulario):
+    """Tomar una ficha de la cubeta de la IP y de la del formulario.
+
+    Devuelve los segundos a esperar (0 si el envío se permite). Un límite en 0
+    desactiva esa cubeta. Si una cubeta está vacía no se consume ninguna.
+    """
+    if not por_ip and not por_formulario:
+        return 0
+
+    ahora = time.time()
+    try:
+        conn = _conectar()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            espera = 0
+            if por_ip:
+                espera = _tomar_ficha(conn, f"ip:{ip}", por_ip, ahora)
+            if not espera and por_formulario:
+                espera = _tomar_ficha(conn, f"formulario:{form_name}", por_formulario, ahora)
+            if _toca_limpiar():
+                conn.execute("DELETE FROM cubetas WHERE lleno <= ?", (ahora,))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        # Una cubeta vacía deshace la ficha tomada de la otra
+        conn.execute("ROLLBACK" if espera else "COMMIT")
+    except sqlite3.Error as e:
+        logger.warning("Límites de envío no disponibles (%s); se permite el envío", e)
+        return 0
+    return espera
+
+
+def huella_envio(form_name, ip, datos):
+    """Huella de un envío: formulario, IP y los campos recibidos (en orden)"""
+    campos = sorted((clave, sorted(datos.getlist(clave))) for clave in datos.keys())
+    contenido = json.dumps([form_name, ip, campos], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+def envio_repetido(huella, ventana):
+    """Registrar la huella; True si ya se vio dentro de los últimos `ventana` segundos"""
+    if not ventana:
+        return False
+
+    ahora = time.time()
+    try:
+        conn = _conectar()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            fila = conn.execute("SELECT momento FROM envios WHERE huella = ?", (huella,)).fetchone()
+            repetido = fila is not None and fila[0] >= ahora - ventana
+            if not repetido:
+                conn.execute("INSERT OR REPLACE INTO envios (huella, momento) VALUES (?, ?)", (huella, ahora))
+            if _toca_limpiar():
+                conn.execute("DELETE FROM envios WHERE momento < ?", (ahora - ventana,))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    except sqlite3.Error as e:
+        logger.warning("Control de reenvíos no disponible (%s)", e)
+        return False
+    return repetido
+
+
+def liberar_envio(huella):
+    """Olvidar una huella (el envío no se guardó y se puede corregir y reenviar)"""
+    try:
+        _conectar().execute("DELETE FROM envios WHERE huella = ?", (huella,))
+    except sqlite3.Error:
+        pass
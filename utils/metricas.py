@@ -0,0 +1,157 @@
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import g, request, before_render_template, template_rendered
+
+# Métricas en memoria del proceso, expuestas en formato de texto de Prometheus.
+# Con varios workers de gunicorn cada worker lleva sus propios valores y el
+# endpoint muestra los del worker que atiende la petición.
+
+logger = logging.getLogger("form_web")
+
+# Límites superiores (segundos) de los buckets de los histogramas
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+# (métrica, etiquetas) -> {"buckets": [int], "suma": float, "cuenta": int}
+_histogramas = {}
+# (métrica, etiquetas) -> int
+_contadores = {}
+
+_AYUDA = {
+    "formweb_http_request_duration_seconds": ("histogram", "Latencia de las peticiones HTTP por ruta"),
+    "formweb_http_requests_total": ("counter", "Peticiones HTTP por ruta, método y estado"),
+    "formweb_span_duration_seconds": ("histogram", "Duración de operaciones internas (spans)"),
+    "formweb_template_render_seconds": ("histogram", "Duración del renderizado de templates"),
+}
+
+
+def _etiquetas(etiquetas):
+    return tuple(sorted(etiquetas.items()))
+
+
+def observar(metrica, segundos, **etiquetas):
+    """Registrar una duración en un histograma"""
+    clave = (metrica, _etiquetas(etiquetas))
+    with _lock:
+        hist = _histogramas.get(clave)
+        if hist is None:
+            hist = _histogramas[clave] = {"buckets": [0] * len(BUCKETS), "suma": 0.0, "cuenta": 0}
+        for i, limite in enumerate(BUCKETS):
+            if segundos <= limite:
+                hist["buckets"][i] += 1
+        hist["suma"] += segundos
+        hist["cuenta"] += 1
+
+
+def incrementar(metrica, valor=1, **etiquetas):
+    """Incrementar un contador"""
+    clave = (metrica, _etiquetas(etiquetas))
+    with _lock:
+        _contadores[clave] = _contadores.get(clave, 0) + valor
+
+
+@contextmanager
+def span(nombre):
+    """Medir la duración de un bloque como span `nombre`"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar("formweb_span_duration_seconds", time.perf_counter() - inicio, span=nombre)
+
+
+def medir(nombre):
+    """Decorador: medir cada llamada a la función como span `nombre`"""
+    def decorador(f):
+        @wraps(f)
+        def envoltura(*args, **kwargs):
+            with span(nombre):
+                return f(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formatear_etiquetas(etiquetas, extra=()):
+    pares = list(etiquetas) + list(extra)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares) + "}"
+
+
+def exportar_prometheus():
+    """Todas las métricas en formato de texto de Prometheus (versión 0.0.4)"""
+    with _lock:
+        histogramas = {k: {"buckets": list(v["buckets"]), "suma": v["suma"], "cuenta": v["cuenta"]}
+                       for k, v in _histogramas.items()}
+        contadores = dict(_contadores)
+
+    lineas = []
+    metricas = sorted({m for m, _ in histogramas} | {m for m, _ in contadores})
+    for metrica in metricas:
+        tipo, ayuda = _AYUDA.get(metrica, ("untyped", metrica))
+        lineas.append(f"# HELP {metrica} {ayuda}")
+        lineas.append(f"# TYPE {metrica} {tipo}")
+        for (m, etiquetas), hist in sorted(histogramas.items()):
+            if m != metrica:
+                continue
+            for limite, cuenta in zip(BUCKETS, hist["buckets"]):
+                lineas.append(f"{m}_bucket{_formatear_etiquetas(etiquetas, [('le', limite)])} {cuenta}")
+            lineas.append(f"{m}_bucket{_formatear_etiquetas(etiquetas, [('le', '+Inf')])} {hist['cuenta']}")
+            lineas.append(f"{m}_sum{_formatear_etiquetas(etiquetas)} {hist['suma']:.6f}")
+            lineas.append(f"{m}_count{_formatear_etiquetas(etiquetas)} {hist['cuenta']}")
+        for (m, etiquetas), valor in sorted(contadores.items()):
+            if m == metrica:
+                lineas.append(f"{m}{_formatear_etiquetas(etiquetas)} {valor}")
+    return "\n".join(lineas) + "\n"
+
+
+def instrumentar(app):
+    """Registrar hooks de Flask para medir cada petición y cada template"""
+
+    @app.before_request
+    def _iniciar_medicion():
+        g._inicio_peticion = time.perf_counter()
+
+    @app.after_request
+    def _registrar_peticion(response):
+        inicio = g.pop("_inicio_peticion", None)
+        if inicio is None:
+            return response
+
+        duracion = time.perf_counter() - inicio
+        ruta = request.url_rule.rule if request.url_rule else "sin_ruta"
+        observar("formweb_http_request_duration_seconds", duracion, ruta=ruta, metodo=request.method)
+        incrementar("formweb_http_requests_total", ruta=ruta, metodo=request.method, estado=response.status_code)
+
+        # Log estructurado (una línea JSON por petición)
+        logger.info(json.dumps({
+            "evento": "peticion",
+            "metodo": request.method,
+            "ruta": ruta,
+            "path": request.path,
+            "estado": response.status_code,
+            "duracion_ms": round(duracion * 1000, 2),
+        }, ensure_ascii=False))
+        return response
+
+    def _antes_de_render(sender, template, context, **extra):
+        g.setdefault("_inicio_templates", []).append(time.perf_counter())
+
+    def _despues_de_render(sender, template, context, **extra):
+        inicios = g.get("_inicio_templates")
+        if inicios:
+            observar("formweb_template_render_seconds", time.perf_counter() - inicios.pop(),
+                     template=template.name or "sin_nombre")
+
+    # weak=False: las funciones locales no tienen otra referencia
+    before_render_template.connect(_antes_de_render, app, weak=False)
+    template_rendered.connect(_despues_de_render, app, weak=False)
@@ -0,0 +1,115 @@
+import hashlib
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+
+import qrcode
+from PIL import Image, ImageDraw, ImageFont
+
+# Cantidad de imágenes PNG distintas que se conservan en memoria
+QR_CACHE_TAMAÑO = 256
+
+
+@lru_cache(maxsize=QR_CACHE_TAMAÑO)
+def generar_qr_png(url, box_size=10, border=4):
+    """PNG de un código QR y su ETag, en caché por (url, box_size, border).
+
+    Devuelve (png_bytes, etag); el ETag es el hash SHA-256 de los bytes.
+    Llamar con box_size y border por nombre: lru_cache guarda por separado
+    las llamadas posicionales y las nombradas.
+    """
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(url)
+    qr.make(fit=True)
+
+    # Crear imagen del QR y convertir a bytes
+    img = qr.make_image(fill_color="black", back_color="white")
+    img_buffer = BytesIO()
+    img.save(img_buffer, format='PNG')
+    png = img_buffer.getvalue()
+    return png, hashlib.sha256(png).hexdigest()
+
+
+class _SalidaStreaming:
+    """Archivo de solo escritura que acumula bytes para enviarlos por partes"""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b"".join(self.partes)
+        self.partes = []
+        return datos
+
+
+def generar_lote_qr(urls, box_size=10, border=4, hilos=4):
+    """Generar en paralelo los PNG de varios QR. `urls` es {nombre: url}.
+
+    Devuelve [(nombre, png_bytes)] en el mismo orden.
+    """
+    nombres = list(urls)
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        resultados = pool.map(lambda nombre: generar_qr_png(urls[nombre], box_size=box_size, border=border)[0], nombres)
+        return list(zip(nombres, resultados))
+
+
+def zip_qr(imagenes):
+    """Generar un ZIP con los PNG en streaming (un fragmento por imagen)"""
+    salida = _SalidaStreaming()
+    # Los PNG ya están comprimidos: se guardan sin volver a comprimir
+    with zipfile.ZipFile(salida, "w", compression=zipfile.ZIP_STORED) as archivo_zip:
+        for nombre, png in imagenes:
+            archivo_zip.writestr(f"qr_{nombre}.png", png)
+            yield salida.vaciar()
+    yield salida.vaciar()
+
+
+# Hoja A4 a 150 ppp, 2 columnas x 3 filas de códigos por página
+HOJA_TAMAÑO = (1240, 1754)
+HOJA_COLUMNAS = 2
+HOJA_FILAS = 3
+HOJA_MARGEN = 60
+
+
+def hoja_qr_pdf(imagenes):
+    """PDF de varias páginas listo para imprimir. `imagenes` es [(título, png_bytes)]"""
+    ancho, alto = HOJA_TAMAÑO
+    celda_ancho = (ancho - 2 * HOJA_MARGEN) // HOJA_COLUMNAS
+    celda_alto = (alto - 2 * HOJA_MARGEN) // HOJA_FILAS
+    lado_qr = min(celda_ancho, celda_alto - 60) - 40
+    por_pagina = HOJA_COLUMNAS * HOJA_FILAS
+    fuente = ImageFont.load_default(size=32)
+
+    paginas = []
+    for i, (titulo, png) in enumerate(imagenes):
+        if i % por_pagina == 0:
+            paginas.append(Image.new("RGB", HOJA_TAMAÑO, "white"))
+            dibujo = ImageDraw.Draw(paginas[-1])
+
+        fila, columna = divmod(i % por_pagina, HOJA_COLUMNAS)
+        x = HOJA_MARGEN + columna * celda_ancho
+        y = HOJA_MARGEN + fila * celda_alto
+
+        qr_img = Image.open(BytesIO(png)).convert("RGB").resize((lado_qr, lado_qr), Image.NEAREST)
+        paginas[-1].paste(qr_img, (x + (celda_ancho - lado_qr) // 2, y))
+        dibujo.text((x + celda_ancho // 2, y + lado_qr + 20), titulo, fill="black", font=fuente, anchor="ma")
+
+    if not paginas:
+        paginas.append(Image.new("RGB", HOJA_TAMAÑO, "white"))
+
+    salida = BytesIO()
+    paginas[0].save(salida, format="PDF", save_all=True, append_images=paginas[1:], resolution=150)
+    return salida.getvalue()
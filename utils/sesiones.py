@@ -0,0 +1,158 @@
+import os
+import time
+import hashlib
+import secrets
+import sqlite3
+import threading
+
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from werkzeug.datastructures import CallbackDict
+
+from utils import basedatos, storage
+from utils.metricas import logger
+
+# Sesiones del lado del servidor (opcional, config SESIONES = "sqlite"): la
+# cookie lleva solo un identificador aleatorio y los datos (logged_in, mensajes
+# flash) viven en data/sesiones.db, compartida por los workers. No se firma
+# ni se serializa la sesión en cada respuesta, y un pedido sin cookie (un
+# escaneo anónimo de QR) no toca la base. En la base se guarda el hash del
+# identificador. El identificador cambia solo al iniciar o cerrar sesión
+# (`session.regenerar = True`), así una cookie plantada de antemano no sirve;
+# los demás cambios (p. ej. un mensaje flash) se guardan bajo el mismo
+# identificador y no cierran la sesión en otras pestañas.
+
+# Conexión por hilo (ver utils/basedatos.py)
+_local = threading.local()
+# Operaciones entre limpiezas de sesiones vencidas
+LIMPIAR_CADA = 1000
+_contador = {"operaciones": 0}
+
+
+def _ruta_db():
+    return os.path.join(storage.DATA_DIR, "sesiones.db")
+
+
+def _crear_tablas(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sesiones (
+            hash TEXT PRIMARY KEY,
+            datos TEXT NOT NULL,
+            expira REAL NOT NULL
+        )
+    """)
+
+
+def _conectar():
+    return basedatos.conectar(_local, _ruta_db(), timeout=5, preparar=_crear_tablas)
+
+
+def _hash(sid):
+    return hashlib.sha256(sid.encode("utf-8")).hexdigest()
+
+
+class SesionServidor(CallbackDict, SessionMixin):
+    """Sesión cuyos datos se guardan en la base; `sid` es None hasta guardarla.
+
+    `regenerar` pide un identificador nuevo al guardar (cambio de privilegios).
+    """
+
+    def __init__(self, datos=None, sid=None):
+        def al_cambiar(sesion):
+            sesion.modified = True
+            sesion.accessed = True
+
+        super().__init__(datos, al_cambiar)
+        self.sid = sid
+        self.modified = False
+        self.accessed = False
+        self.regenerar = False
+
+    def __getitem__(self, clave):
+        self.accessed = True
+        return super().__getitem__(clave)
+
+    def get(self, clave, default=None):
+        self.accessed = True
+        return super().get(clave, default)
+
+    def setdefault(self, clave, default=None):
+        self.accessed = True
+        return super().setdefault(clave, default)
+
+
+class SesionesSQLite(SessionInterface):
+    """Interfaz de sesiones de Flask sobre data/sesiones.db"""
+
+    def _cargar(self, sid):
+        try:
+            fila = _conectar().execute(
+                "SELECT datos FROM sesiones WHERE hash = ? AND expira > ?", (_hash(sid), time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Sesiones no disponibles (%s)", e)
+            return None
+        return session_json_serializer.loads(fila[0]) if fila else None
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        datos = self._cargar(sid) if sid else None
+        if datos is None:
+            return SesionServidor()
+        return SesionServidor(datos, sid)
+
+    def save_session(self, app, session, response):
+        nombre = self.get_cookie_name(app)
+        dominio = self.get_cookie_domain(app)
+        ruta = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+        if not session.modified:
+            return
+
+        try:
+            conn = _conectar()
+            if not session:
+                # Sesión vaciada (logout): borrar datos y cookie
+                if session.sid:
+                    conn.execute("DELETE FROM sesiones WHERE hash = ?", (_hash(session.sid),))
+                    response.delete_cookie(nombre, domain=dominio, path=ruta,
+                                           secure=self.get_cookie_secure(app),
+                                           httponly=self.get_cookie_httponly(app),
+                                           samesite=self.get_cookie_samesite(app),
+                                           partitioned=self.get_cookie_partitioned(app))
+                return
+
+            ahora = time.time()
+            datos = session_json_serializer.dumps(dict(session))
+            expira = ahora + app.permanent_session_lifetime.total_seconds()
+            if session.sid and not session.regenerar:
+                # Mismo identificador: otras pestañas con la misma cookie siguen valiendo
+                sid = session.sid
+                if not conn.execute("UPDATE sesiones SET datos = ?, expira = ? WHERE hash = ?",
+                                    (datos, expira, _hash(sid))).rowcount:
+                    return  # Se cerró o venció mientras tanto: no revivirla
+            else:
+                sid = secrets.token_urlsafe(32)
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    if session.sid:
+                        conn.execute("DELETE FROM sesiones WHERE hash = ?", (_hash(session.sid),))
+                    conn.execute("INSERT INTO sesiones (hash, datos, expira) VALUES (?, ?, ?)",
+                                 (_hash(sid), datos, expira))
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                conn.execute("COMMIT")
+            _contador["operaciones"] += 1
+            if _contador["operaciones"] % LIMPIAR_CADA == 0:
+                conn.execute("DELETE FROM sesiones WHERE expira <= ?", (ahora,))
+        except sqlite3.Error as e:
+            logger.warning("No se pudo guardar la sesión (%s)", e)
+            return
+
+        session.sid = sid
+        response.set_cookie(nombre, sid, expires=self.get_expiration_time(app, session),
+                            domain=dominio, path=ruta, secure=self.get_cookie_secure(app),
+                            httponly=self.get_cookie_httponly(app), samesite=self.get_cookie_samesite(app),
+                            partitioned=self.get_cookie_partitioned(app))
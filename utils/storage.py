@@ -1,69 +1,224 @@
 import os
 import json
-import csv
+import importlib
+from datetime import datetime
 
-# Ruta absoluta a la carpeta de datos (persistente en Render)
+from utils.bloqueos import bloqueo_archivo
+from utils.metricas import medir
+from utils.formularios import version_formulario
+from utils import claves
+
+# Ruta absoluta a la carpeta de datos (persistente en Render); create_app la
+# toma de la configuración (DATA_DIR) con configurar_carpeta
 BASE_DIR = os.getcwd()
 DATA_DIR = os.path.join(BASE_DIR, "data")
 
-# Crear carpeta de datos si no existe
-os.makedirs(DATA_DIR, exist_ok=True)
+# Backends de almacenamiento (config STORAGE_BACKEND). Cada módulo implementa
+# las mismas funciones: migrar_registros, migrar_todos, iterar_registros,
+# cargar_registros, clave_existe, guardar_registros, eliminar_registros,
+# invalidar_indices, existen_registros, listar_datos, archivo_descarga,
+# estado_log y leer_log_desde. Los que guardan en segmentos declaran
+# PERMITE_ARCHIVAR = True e implementan además archivar_registros.
+BACKENDS = {
+    "archivos": "utils.backend_archivos",
+    "sqlite": "utils.backend_sqlite",
+}
 
+_backend = None
 
-def cargar_registros(form_name):
-    """Cargar registros existentes en JSON"""
-    ruta = os.path.join(DATA_DIR, f"{form_name}.json")
 
-    if not os.path.exists(ruta):
-        return []
+class RegistroDuplicado(Exception):
+    """El backend rechazó un registro por repetir el identificador único"""
 
-    try:
-        with open(ruta, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except json.JSONDecodeError:
+
+def configurar_backend(nombre, archivar_mb=0):
+    """Seleccionar el backend de almacenamiento por nombre.
+
+    `archivar_mb`: tamaño del log activo a partir del cual se archiva solo
+    (0 = solo a mano), en los backends que archivan.
+    """
+    global _backend
+    if nombre not in BACKENDS:
+        raise ValueError(f"Backend de almacenamiento desconocido: {nombre}")
+    _backend = importlib.import_module(BACKENDS[nombre])
+    if permite_archivar():
+        _backend.ARCHIVAR_MB = archivar_mb
+
+
+def configurar_carpeta(ruta):
+    """Usar `ruta` (relativa al directorio de trabajo) como carpeta de datos"""
+    global DATA_DIR
+    DATA_DIR = os.path.abspath(ruta)
+
+
+def nombre_backend():
+    return next(nombre for nombre, modulo in BACKENDS.items() if modulo == _backend.__name__)
+
+
+def _ruta_bloqueo(form_name):
+    """Archivo de bloqueo por formulario para serializar escrituras entre workers"""
+    return os.path.join(DATA_DIR, f"{form_name}.lock")
+
+
+def bloqueo_formulario(form_name):
+    """Bloqueo exclusivo de los datos de un formulario (no es reentrante)"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return bloqueo_archivo(_ruta_bloqueo(form_name))
+
+
+def renombrar_migrado(ruta):
+    """Conservar un archivo ya importado como `<ruta>.migrado` sin pisar uno
+    anterior (`.migrado.2`, `.migrado.3`...)"""
+    destino, numero = f"{ruta}.migrado", 1
+    while os.path.exists(destino):
+        numero += 1
+        destino = f"{ruta}.migrado.{numero}"
+    os.replace(ruta, destino)
+
+
+def rutas_migradas(ruta):
+    """Copias `.migrado` existentes de un archivo heredado"""
+    carpeta, nombre = os.path.split(f"{ruta}.migrado")
+    if not os.path.isdir(carpeta):
         return []
+    return [os.path.join(carpeta, archivo) for archivo in os.listdir(carpeta)
+            if archivo == nombre or (archivo.startswith(nombre + ".") and archivo[len(nombre) + 1:].isdigit())]
+
+
+def migrar_registros(form_name):
+    """Incorporar una sola vez los datos heredados (data/<form>.json)"""
+    _backend.migrar_registros(form_name)
+
+
+def migrar_todos():
+    _backend.migrar_todos()
+
 
+def iterar_registros(form_name):
+    """Iterar los registros de un formulario sin cargarlos todos en memoria"""
+    return _backend.iterar_registros(form_name)
 
+
+@medir("cargar_registros")
+def cargar_registros(form_name):
+    """Cargar registros existentes en una lista (en memoria: preferir iterar_registros)"""
+    return _backend.cargar_registros(form_name)
+
+
+@medir("usuario_existe")
 def usuario_existe(form_name, identificador, valor_identificador):
     """Validar si ya existe un registro con el identificador único"""
-    registros = cargar_registros(form_name)
-    return any(reg.get(identificador) == valor_identificador for reg in registros)
+    clave = claves.definir_clave([identificador])
+    valor = claves.valor_clave(clave, {identificador: valor_identificador})
+    return valor is not None and _backend.clave_existe(form_name, clave, valor)
 
 
-def guardar_registro(form_name, data):
-    """Guardar datos en JSON y CSV (persistentes en Render)"""
-    os.makedirs(DATA_DIR, exist_ok=True)
+@medir("registro_duplicado")
+def registro_duplicado(form_name, data):
+    """Primera clave única del formulario (utils/claves.py) que `data` repite, o None"""
+    for clave in claves.claves_formulario(form_name):
+        valor = claves.valor_clave(clave, data)
+        if valor is not None and _backend.clave_existe(form_name, clave, valor):
+            return clave
+    return None
 
-    # -------------------
-    # Guardar en JSON
-    # -------------------
-    registros = cargar_registros(form_name)
 
+def _version(form_name):
+    try:
+        return version_formulario(form_name)
+    except json.JSONDecodeError:
+        return None
+
+
+def _normalizar(data, version):
+    """Preparar un registro antes de guardarlo (igual para todos los backends)"""
     # Convertir valores con comas en listas
     for k, v in data.items():
-        if isinstance(v, str) and "," in v:
+        if isinstance(v, str) and "," in v and not k.startswith("_"):
             data[k] = v.split(",")
 
-    registros.append(data)
-
-    json_path = os.path.join(DATA_DIR, f"{form_name}.json")
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(registros, f, indent=4, ensure_ascii=False)
-
-    # -------------------
-    # Guardar en CSV
-    # -------------------
-    csv_path = os.path.join(DATA_DIR, f"{form_name}.csv")
-    file_exists = os.path.exists(csv_path)
-
-    # Convertir listas a cadenas separadas por |
-    csv_data = {
-        k: "|".join(v) if isinstance(v, list) else v
-        for k, v in data.items()
-    }
-
-    with open(csv_path, "a", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=list(csv_data.keys()))
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow(csv_data)
+    # Metadatos internos (claves con "_"): se guardan pero no van al CSV. El
+    # backend agrega `_seq`, el número de secuencia creciente del registro
+    data.setdefault("_fecha", datetime.now().isoformat(timespec="seconds"))
+    if version is not None:
+        data.setdefault("_version", version)  # Versión del esquema del formulario
+
+
+def preparar_registros(form_name, registros):
+    """Normalizar registros y agregar sus metadatos. Se puede repetir sin efecto"""
+    version = _version(form_name)
+    for data in registros:
+        _normalizar(data, version)
+
+
+@medir("guardar_registro")
+def guardar_registro(form_name, data):
+    """Guardar datos (persistentes en Render)"""
+    guardar_registros(form_name, [data])
+
+
+def guardar_registros(form_name, registros):
+    """Guardar varios registros en una sola escritura.
+
+    Lanza RegistroDuplicado si un registro repite una clave única del formulario.
+    """
+    if not registros:
+        return
+    preparar_registros(form_name, registros)
+    _backend.guardar_registros(form_name, registros)
+
+
+def eliminar_registros(form_name):
+    """Eliminar todos los datos de un formulario"""
+    _backend.eliminar_registros(form_name)
+
+
+def permite_archivar():
+    """Si el backend configurado puede archivar registros en segmentos"""
+    return getattr(_backend, "PERMITE_ARCHIVAR", False)
+
+
+def archivar_registros(form_name):
+    """Sellar los registros actuales en un segmento archivado comprimido.
+
+    Devuelve la descripción del segmento, o None si no había registros.
+    Solo con backends que lo permiten (ver permite_archivar).
+    """
+    return _backend.archivar_registros(form_name)
+
+
+def invalidar_indices(form_name):
+    """Descartar los índices de un formulario (se reconstruyen al consultarlos)"""
+    _backend.invalidar_indices(form_name)
+
+
+def existen_registros(form_name):
+    return _backend.existen_registros(form_name)
+
+
+def listar_datos():
+    """Conjuntos de datos disponibles: [{"nombre", "formulario", "tamaño"}]"""
+    return _backend.listar_datos()
+
+
+def archivo_descarga(nombre):
+    """Ruta de un archivo de datos ya guardado, o None si hay que generarlo"""
+    return _backend.archivo_descarga(nombre)
+
+
+def estado_log(form_name):
+    """(generación, posición) de los datos de un formulario.
+
+    La posición crece con cada registro; la generación cambia cuando los
+    datos se reemplazan. Índices, espejos y estadísticas la usan para
+    ponerse al día leyendo solo lo nuevo.
+    """
+    return _backend.estado_log(form_name)
+
+
+def leer_log_desde(form_name, posicion):
+    """Iterar (registro, posición_siguiente) a partir de una posición"""
+    return _backend.leer_log_desde(form_name, posicion)
+
+
+configurar_backend(os.getenv("STORAGE_BACKEND", "archivos"))
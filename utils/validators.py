@@ -1,73 +1,137 @@
 import re
 
-def validar_input(valor, campo):
+from werkzeug.datastructures import MultiDict
+
+from utils.metricas import medir
+
+# Expresiones regulares precompiladas (una sola vez por proceso)
+# Solo letras y espacios opcional
+RE_TEXTO = re.compile(r"^[\w\sáéíóúÁÉÍÓÚñÑ.,-]*$")
+RE_EMAIL = re.compile(r"^[\w\.-]+@[\w\.-]+\.\w+$")
+
+LONGITUD_MAXIMA_TEXTAREA = 500
+
+
+def _compilar_campo(campo):
+    """Resolver una sola vez las reglas de un campo y devolver su función de validación"""
     tipo = campo.get("tipo")
-    opciones = campo.get("opciones", [])
+    obligatorio = bool(campo.get("obligatorio", False))
+    opciones = frozenset(campo.get("opciones", []))
 
     # Texto libre
     if tipo == "text":
-        if not valor:
-            return not campo.get("obligatorio", False)
-        # Solo letras y espacios opcional
-        return bool(re.match(r"^[\w\sáéíóúÁÉÍÓÚñÑ.,-]*$", valor))
+        def validar(valor):
+            return bool(RE_TEXTO.match(valor))
 
     # Correo electrónico
-    if tipo == "email":
-        if not valor:
-            return not campo.get("obligatorio", False)
-        return bool(re.match(r"^[\w\.-]+@[\w\.-]+\.\w+$", valor))
+    elif tipo == "email":
+        def validar(valor):
+            return bool(RE_EMAIL.match(valor))
 
     # Número
-    if tipo == "number":
-        if not valor:
-            return not campo.get("obligatorio", False)
-        if not valor.isdigit():
-            return False
-        # Validar longitud exacta si se especifica
-        longitud = campo.get("longitud")
-        if longitud and len(valor) != longitud:
-            return False
-        # Opcional: rango mínimo/máximo
-        minimo = campo.get("min")
-        maximo = campo.get("max")
-        if minimo and int(valor) < minimo:
-            return False
-        if maximo and int(valor) > maximo:
-            return False
-        return True
-
-
-    # Select
-    if tipo == "select":
-        if not valor:
-            return not campo.get("obligatorio", False)
-        return valor in opciones
+    elif tipo == "number":
+        # Longitud exacta y rango mínimo/máximo opcionales (0 = sin límite)
+        longitud = campo.get("longitud") or None
+        minimo = campo.get("min") or None
+        maximo = campo.get("max") or None
+
+        def validar(valor):
+            if not valor.isdigit():
+                return False
+            if longitud is not None and len(valor) != longitud:
+                return False
+            if minimo is not None and int(valor) < minimo:
+                return False
+            if maximo is not None and int(valor) > maximo:
+                return False
+            return True
+
+    # Select y Radio
+    elif tipo in ("select", "radio"):
+        def validar(valor):
+            return isinstance(valor, str) and valor in opciones
 
     # Checkbox (lista de valores)
-    if tipo == "checkbox":
-        if not valor:
-            return not campo.get("obligatorio", False)
-        
-        valores_lista = valor if isinstance(valor, list) else [valor]
-        
-        # Validar cantidad de opciones
-        if not campo.get("multiple", True) and len(valores_lista) > 1:
-            return False
-        
-        # Validar que las opciones sean válidas
-        return all(v in opciones for v in valores_lista)
-    
-    # Radio
-    if tipo == "radio":
-        if not valor:
-            return not campo.get("obligatorio", False)
-        return valor in opciones
+    elif tipo == "checkbox":
+        multiple = campo.get("multiple", True)
+
+        def validar(valor):
+            valores_lista = valor if isinstance(valor, list) else [valor]
+            # Validar cantidad de opciones
+            if not multiple and len(valores_lista) > 1:
+                return False
+            # Validar que las opciones sean válidas
+            return opciones.issuperset(valores_lista)
 
     # Textarea
-    if tipo == "textarea":
+    elif tipo == "textarea":
+        def validar(valor):
+            return len(valor) <= LONGITUD_MAXIMA_TEXTAREA
+
+    else:
+        def validar(valor):
+            return True  # Por defecto, pasa la validación
+
+    def validar_campo(valor):
         if not valor:
-            return not campo.get("obligatorio", False)
-        # Opcional: longitud máxima 500
-        return len(valor) <= 500
+            return not obligatorio
+        return validar(valor)
+
+    return validar_campo
+
+
+@medir("validar_input")
+def validar_input(valor, campo):
+    return _compilar_campo(campo)(valor)
+
+
+class ValidadorFormulario:
+    """Validador precompilado de un formulario (se construye una vez por versión)"""
+
+    def __init__(self, campos):
+        self.campos = [
+            (campo["nombre"], campo["tipo"] == "checkbox", bool(campo.get("obligatorio")), _compilar_campo(campo))
+            for campo in campos
+        ]
+
+    @medir("validar_formulario")
+    def validar(self, form):
+        """Leer y validar los campos enviados.
+
+        `form` es el MultiDict de `request.form`. Devuelve (datos, errores_por_campo).
+        """
+        datos = {}
+        errores = {}
+        for nombre_campo, es_checkbox, obligatorio, validar_campo in self.campos:
+            # Checkbox puede ser multiple, otros campos simples
+            if es_checkbox:
+                valor = form.getlist(nombre_campo)
+            else:
+                valor = form.get(nombre_campo, "").strip()
+
+            datos[nombre_campo] = valor
+
+            # Validaciones por campo
+            if obligatorio and (not valor or valor == [""]):
+                errores[nombre_campo] = "Este campo es obligatorio"
+            elif not validar_campo(valor):
+                errores[nombre_campo] = "El valor no cumple con el formato requerido"
+
+        return datos, errores
+
+    def validar_fila(self, fila):
+        """Validar una fila importada (dict leído de CSV o JSON Lines).
 
-    return True  # Por defecto, pasa la validación
+        Los checkbox pueden venir como lista o como texto separado por "|".
+        """
+        form = MultiDict()
+        for nombre_campo, es_checkbox, _, _ in self.campos:
+            valor = fila.get(nombre_campo)
+            if valor is None:
+                continue
+            if es_checkbox:
+                valores = valor if isinstance(valor, list) else [v for v in str(valor).split("|") if v]
+                form.setlist(nombre_campo, [str(v) for v in valores])
+            else:
+                form[nombre_campo] = str(valor)
+        return self.validar(form)